@@ -0,0 +1,152 @@
+"""Bearer-token authentication for write endpoints.
+
+Access tokens carry the user's id and role, so verifying one needs no
+database query. Decoded principals are kept in a bounded LRU keyed by the
+raw token, which skips signature verification for repeat requests, and
+every lookup is checked against an in-memory set of revoked token ids.
+"""
+import heapq
+import os
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+# JWT Secret (in production, use environment variable)
+SECRET_KEY = os.environ.get("SECRET_KEY", "a-default-secret-for-dev")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Role of tokens for backfill jobs, issued with `python manage.py service-token`; users can't register with it
+SERVICE_ROLE = "service"
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "10000"))
+
+
+class Principal(NamedTuple):
+    id: int
+    role: str
+    token_id: str
+    expires: float
+
+
+def create_access_token(user_id: int, role: str, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
+    expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
+    claims = {"sub": str(user_id), "role": role, "jti": secrets.token_urlsafe(8), "exp": expire}
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def decode_access_token(token: str) -> Principal:
+    """Verify the signature and expiry; raises ``jwt.InvalidTokenError``"""
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+    try:
+        return Principal(int(claims["sub"]), claims.get("role", ""), claims.get("jti", ""), float(claims["exp"]))
+    except (TypeError, ValueError):
+        raise jwt.InvalidTokenError("Malformed claims")
+
+
+class RevocationList:
+    """Ids of revoked tokens, each kept only until the token would have expired anyway"""
+
+    def __init__(self):
+        self._expiries = {}
+        self._heap = []
+
+    def revoke(self, token_id: str, expires: float):
+        self._prune()
+        if token_id and token_id not in self._expiries:
+            self._expiries[token_id] = expires
+            heapq.heappush(self._heap, (expires, token_id))
+
+    def __contains__(self, token_id: str) -> bool:
+        return token_id in self._expiries
+
+    def __len__(self):
+        return len(self._expiries)
+
+    def _prune(self):
+        now = time.time()
+        while self._heap and self._heap[0][0] < now:
+            _, token_id = heapq.heappop(self._heap)
+            del self._expiries[token_id]
+
+
+class PrincipalCache:
+    """LRU of token -> decoded principal; expiry is re-checked on every hit"""
+
+    def __init__(self, max_entries: int = AUTH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, token: str) -> Optional[Principal]:
+        principal = self._entries.get(token)
+        if principal is None:
+            self.misses += 1
+            return None
+        if principal.expires < time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return principal
+
+    def set(self, token: str, principal: Principal):
+        self._entries[token] = principal
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+principals = PrincipalCache()
+revoked = RevocationList()
+bearer = HTTPBearer(auto_error=False)
+
+
+def _unauthorized(detail: str):
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def authenticate(token: str) -> Principal:
+    principal = principals.get(token)
+    if principal is None:
+        try:
+            principal = decode_access_token(token)
+        except jwt.InvalidTokenError:
+            raise _unauthorized("Invalid or expired token")
+        principals.set(token, principal)
+    if principal.token_id in revoked:
+        raise _unauthorized("Token has been revoked")
+    return principal
+
+
+async def get_principal(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer)) -> Principal:
+    """Dependency for endpoints that need a signed-in user"""
+    if credentials is None:
+        raise _unauthorized("Not authenticated")
+    return authenticate(credentials.credentials)
+
+
+def require_role(role: str):
+    """Dependency factory for endpoints limited to creators, investors or service jobs"""
+    async def dependency(principal: Principal = Depends(get_principal)) -> Principal:
+        if principal.role != role:
+            raise HTTPException(status_code=403, detail=f"Only {role}s can do this")
+        return principal
+    return dependency
+
+
+def ensure_user(principal: Principal, user_id: Optional[int]):
+    """403 unless ``user_id`` (when given) is the signed-in user"""
+    if user_id is not None and user_id != principal.id:
+        raise HTTPException(status_code=403, detail="Not allowed to act for another user")
+
+
+def revoke_token(principal: Principal):
+    revoked.revoke(principal.token_id, principal.expires)
@@ -0,0 +1,197 @@
+"""Load-test harness for the FlowMint API.
+
+Seeds a synthetic dataset into a scratch database, then drives the real
+endpoints in-process over ASGI with concurrent clients and reports latency
+percentiles and throughput per endpoint. Results are written as JSON (tagged
+with the git commit) so runs can be compared across commits:
+
+    python bench.py --investments 1000000 --requests 2000 --concurrency 32
+    python bench.py --compare bench_results/<earlier-run>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="database to seed and benchmark (default: a fresh temporary SQLite file)")
+    parser.add_argument("--reuse", action="store_true", help="skip seeding and benchmark the existing data in --database-url")
+    parser.add_argument("--creators", type=int, default=200)
+    parser.add_argument("--investors", type=int, default=5000)
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--investments", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default="bench_results")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    return parser.parse_args()
+
+
+def scenarios(creator_ids, investor_ids, project_ids, rng):
+    """Endpoint name -> callable producing (method, url, json body[, headers]) for one request"""
+    from auth import create_access_token
+
+    counter = iter(range(10 ** 12))
+    tokens = {}
+
+    def as_investor():
+        investor_id = rng.choice(investor_ids)
+        if investor_id not in tokens:
+            tokens[investor_id] = create_access_token(investor_id, "investor")
+        return {"Authorization": f"Bearer {tokens[investor_id]}"}
+
+    return {
+        "GET /api/projects": lambda: ("GET", "/api/projects?limit=100", None),
+        "GET /api/projects?after": lambda: ("GET", "/api/projects?after=&limit=100", None),
+        "GET /api/projects/search": lambda: ("GET", f"/api/projects/search?q={rng.randrange(len(project_ids))}", None),
+        "GET /api/projects/{id}": lambda: ("GET", f"/api/projects/{rng.choice(project_ids)}", None),
+        "GET /api/investments?after": lambda: ("GET", "/api/investments?after=&limit=100", None),
+        "GET /api/creator/{id}/dashboard": lambda: ("GET", f"/api/creator/{rng.choice(creator_ids)}/dashboard", None),
+        "GET /api/investor/{id}/dashboard": lambda: ("GET", f"/api/investor/{rng.choice(investor_ids)}/dashboard", None),
+        "GET /api/leaderboard/trending": lambda: ("GET", "/api/leaderboard/trending?window_hours=24", None),
+        "GET /api/rollups/project/{id}": lambda: ("GET", f"/api/rollups/project/{rng.choice(project_ids)}?granularity=hour", None),
+        "POST /api/investments": lambda: ("POST", "/api/investments", {
+            "amount": round(rng.uniform(10, 2000), 2),
+            "nft_token_id": 1,
+            "project_id": rng.choice(project_ids),
+            "transaction_hash": f"0xload{time.time_ns():x}{next(counter)}",
+        }, as_investor()),
+    }
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, make_request, total, concurrency):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, body, *headers = make_request()
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body, headers=headers[0] if headers else None)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+async def benchmark(args, creator_ids, investor_ids, project_ids):
+    import httpx
+    from main import app
+
+    rng = random.Random(args.seed)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request in scenarios(creator_ids, investor_ids, project_ids, rng).items():
+            # Warm caches and the connection pool before measuring
+            await run_scenario(client, make_request, min(args.concurrency, args.requests), args.concurrency)
+            results[name] = await run_scenario(client, make_request, args.requests, args.concurrency)
+            stats = results[name]
+            print(f"{name:36} {stats['throughput_rps']:>9} rps  p50 {stats['p50_ms']:>8} ms  "
+                  f"p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  errors {stats['errors']}")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} (commit {baseline.get('commit')})")
+    for name, stats in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before:
+            continue
+        deltas = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if before[key]:
+                deltas.append(f"{key} {100 * (stats[key] - before[key]) / before[key]:+.1f}%")
+        print(f"{name:36} " + "  ".join(deltas))
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        scratch = os.path.join(tempfile.mkdtemp(prefix="flowmint-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{scratch}"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from sqlalchemy import select
+    from database import run_migrations, engine, User, Project
+    from seeding import seed_synthetic
+
+    run_migrations()
+    if args.reuse:
+        with engine.connect() as conn:
+            creator_ids = list(conn.scalars(select(User.id).where(User.role == "creator")))
+            investor_ids = list(conn.scalars(select(User.id).where(User.role == "investor")))
+            project_ids = list(conn.scalars(select(Project.id)))
+    else:
+        started = time.perf_counter()
+        seeded = seed_synthetic(engine, args.creators, args.investors, args.projects, args.investments, args.seed)
+        if seeded is None:
+            sys.exit("--database-url already holds a synthetic dataset; pass --reuse to benchmark it")
+        creator_ids, investor_ids, project_ids = seeded
+        print(f"seeded {args.creators + args.investors} users, {args.projects} projects, "
+              f"{args.investments} investments in {time.perf_counter() - started:.1f}s")
+
+    endpoints = asyncio.run(benchmark(args, creator_ids, investor_ids, project_ids))
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "database": engine.dialect.name,
+        "params": {key: value for key, value in vars(args).items() if key not in ("compare", "output_dir", "database_url")},
+        "endpoints": endpoints,
+    }
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"{datetime.utcnow():%Y%m%dT%H%M%S}-{result['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nresults written to {path}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
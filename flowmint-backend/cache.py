@@ -0,0 +1,209 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, CollectionVersion, Project, User, async_engine
+from models import ProjectResponse, UserResponse
+from replicas import REPLICA_STICKY_SECONDS
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")  # "memory", "redis" or "none"
+CACHE_URL = os.environ.get("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "10000"))
+
+
+class LRUCache:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    async def set(self, key: str, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        return {"backend": "memory", "hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+class RedisCache:
+    """Cache stored in Redis, shared by all workers.
+
+    ``client`` is anything exposing the async ``get``/``set(ex=)``/``delete``
+    calls of ``redis.asyncio.Redis`` (e.g. fakeredis for local runs).
+    """
+
+    def __init__(self, client, ttl: float = CACHE_TTL_SECONDS, prefix: str = "flowmint:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str):
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value):
+        await self.client.set(self.prefix + key, json.dumps(value), ex=max(int(self.ttl), 1))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    def stats(self):
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+
+class NullCache:
+    """Disables caching; every lookup goes to the database"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str):
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value):
+        pass
+
+    async def delete(self, *keys: str):
+        pass
+
+    def stats(self):
+        return {"backend": "none", "hits": 0, "misses": self.misses}
+
+
+def create_cache():
+    if CACHE_BACKEND == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        return RedisCache(redis.from_url(CACHE_URL))
+    if CACHE_BACKEND == "none":
+        return NullCache()
+    return LRUCache()
+
+
+cache = create_cache()
+
+
+@asynccontextmanager
+async def fill_session(db: AsyncSession, written_at: Optional[float]):
+    """Session to fill the cache from: ``db``, or the primary right after a write.
+
+    ``written_at`` is when the entry was last invalidated (epoch seconds). A
+    replica read within REPLICA_STICKY_SECONDS of that could put back the
+    row the write replaced, and it would be served until the next write or
+    the TTL; later misses fill from the replica.
+    """
+    recent = written_at is not None and time.time() - written_at < REPLICA_STICKY_SECONDS
+    if db.bind is async_engine or isinstance(cache, NullCache) or not recent:
+        yield db
+    else:
+        async with AsyncSessionLocal() as primary:
+            yield primary
+
+
+async def last_written(key: str) -> Optional[float]:
+    return await cache.get(f"written:{key}")
+
+
+async def invalidate(keys: Iterable[str]):
+    """Drops cached entries, remembering when so the next fill avoids a lagging replica"""
+    keys = list(keys)
+    now = time.time()
+    for key in keys:
+        await cache.set(f"written:{key}", now)
+    await cache.delete(*keys)
+
+
+# Cached lookups. Values are JSON-ready response dicts so every backend can store them.
+async def get_cached_project(db: AsyncSession, project_id: int) -> Optional[dict]:
+    key = f"project:{project_id}"
+    data = await cache.get(key)
+    if data is None:
+        async with fill_session(db, await last_written(key)) as source:
+            project = await source.scalar(select(Project).where(Project.id == project_id))
+        if not project:
+            return None
+        data = ProjectResponse.from_orm(project).model_dump(mode="json")
+        await cache.set(key, data)
+    return data
+
+
+async def get_cached_user(db: AsyncSession, user_id: int) -> Optional[dict]:
+    key = f"user:{user_id}"
+    data = await cache.get(key)
+    if data is None:
+        async with fill_session(db, await last_written(key)) as source:
+            user = await source.scalar(select(User).where(User.id == user_id))
+        if not user:
+            return None
+        data = UserResponse.from_orm(user).model_dump(mode="json")
+        await cache.set(key, data)
+    return data
+
+
+async def get_cached_user_by_wallet(db: AsyncSession, wallet_address: str) -> Optional[dict]:
+    # Wallet addresses never change, so the wallet -> id mapping needs no invalidation
+    key = f"wallet:{wallet_address}"
+    user_id = await cache.get(key)
+    if user_id is None:
+        user_id = await db.scalar(select(User.id).where(User.wallet_address == wallet_address))
+        if user_id is None:
+            return None
+        await cache.set(key, user_id)
+    return await get_cached_user(db, user_id)
+
+
+async def collection_version(db: AsyncSession, collection: str) -> int:
+    """The collection's version as of ``db``'s reads; triggers bump it with every write (migration 0010)"""
+    return await db.scalar(select(CollectionVersion.version).where(CollectionVersion.name == collection)) or 0
+
+
+async def invalidate_projects(project_ids: Iterable[int]):
+    await invalidate(f"project:{project_id}" for project_id in set(project_ids))
+
+
+async def invalidate_users(user_ids: Iterable[Optional[int]]):
+    await invalidate(f"user:{user_id}" for user_id in set(user_ids) if user_id is not None)
+
+
+async def invalidate_investment_targets(deltas):
+    """Drop the cached rows whose counters were bumped by ``apply_investment_deltas``"""
+    deltas = list(deltas)
+    await invalidate_projects(project_id for project_id, _, _, _ in deltas)
+    await invalidate_users([investor_id for _, investor_id, _, _ in deltas] + [creator_id for _, _, creator_id, _ in deltas])
@@ -0,0 +1,114 @@
+"""JSON-RPC access to the FlowMint contracts and decoding of their logs.
+
+Only the events the indexer needs are decoded, and the topic hashes and
+selectors are precomputed from the ABIs in ``src/lib/abi`` (keccak-256 of the
+signature in the comment), so no Ethereum library is needed.
+"""
+import itertools
+import os
+from typing import List, NamedTuple, Optional
+import httpx
+
+INDEXER_RPC_URL = os.environ.get("INDEXER_RPC_URL", "http://localhost:8545")
+INDEXER_RPC_TIMEOUT = float(os.environ.get("INDEXER_RPC_TIMEOUT", "30"))
+# Calls per batched request; providers commonly cap batches at 100-1000
+INDEXER_RPC_BATCH_SIZE = int(os.environ.get("INDEXER_RPC_BATCH_SIZE", "100"))
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"  # FlowMintNFT Transfer(address,address,uint256)
+MINTED_TOPIC = "0x30385c845b448a36257a6a1716e6ad2e1bc2cbe333cde1e69fe849ad6511adfe"  # RevenueDistributor Minted(address,uint256)
+REVENUE_DEPOSITED_TOPIC = "0xa233bf660ff45a53efdacc9f262f3ba6a03b00e58e587d8536a4cfec59680a1c"  # RevenueDistributor RevenueDeposited(uint256)
+MINT_PRICE_SELECTOR = "0x6817c76c"  # RevenueDistributor mintPrice()
+MAX_SUPPLY_SELECTOR = "0xd5abeb01"  # RevenueDistributor maxSupply()
+ZERO_ADDRESS = "0x" + "0" * 40
+
+
+class RpcError(Exception):
+    pass
+
+
+class JsonRpc:
+    """Minimal async JSON-RPC 2.0 client.
+
+    ``transport`` is handed to httpx, e.g. ``httpx.ASGITransport(app=rpc_stub.app)``
+    to talk to the stand-in node without a socket.
+    """
+
+    def __init__(self, url: str = INDEXER_RPC_URL, transport=None):
+        self.url = url
+        self.client = httpx.AsyncClient(transport=transport, timeout=INDEXER_RPC_TIMEOUT)
+        self._ids = itertools.count(1)
+
+    async def call(self, method: str, *params):
+        (result,) = await self.batch([(method, list(params))])
+        return result
+
+    async def batch(self, calls) -> list:
+        """Send ``(method, params)`` pairs, INDEXER_RPC_BATCH_SIZE per request; results in call order"""
+        calls = list(calls)
+        results = []
+        for start in range(0, len(calls), INDEXER_RPC_BATCH_SIZE):
+            chunk = calls[start:start + INDEXER_RPC_BATCH_SIZE]
+            ids = [next(self._ids) for _ in chunk]
+            response = await self.client.post(self.url, json=[
+                {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+                for request_id, (method, params) in zip(ids, chunk)
+            ])
+            response.raise_for_status()
+            body = response.json()
+            if not isinstance(body, list):
+                # Some nodes answer a rejected batch with a single error object
+                raise RpcError(body.get("error", body))
+            # Replies may come back in any order
+            replies = {reply.get("id"): reply for reply in body}
+            for request_id, (method, _) in zip(ids, chunk):
+                reply = replies.get(request_id)
+                if reply is None or "error" in reply:
+                    raise RpcError(f"{method}: {reply['error'] if reply else 'no reply'}")
+                results.append(reply["result"])
+        return results
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class ChainEvent(NamedTuple):
+    """A decoded contract log; ``event`` is "mint", "transfer" or "deposit" """
+    event: str
+    address: str
+    block_number: int
+    block_hash: str
+    transaction_hash: str
+    log_index: int
+    sender: Optional[str] = None
+    recipient: Optional[str] = None
+    token_id: Optional[int] = None
+    amount: Optional[int] = None
+
+
+def topic_address(topic: str) -> str:
+    return "0x" + topic[-40:].lower()
+
+
+def decode_log(log: dict) -> Optional[ChainEvent]:
+    """Decode a FlowMintNFT Transfer or RevenueDistributor RevenueDeposited log; None for anything else"""
+    topics = log.get("topics") or []
+    if not topics or log.get("removed"):
+        return None
+    position = (
+        log["address"].lower(), int(log["blockNumber"], 16), log["blockHash"],
+        log["transactionHash"], int(log["logIndex"], 16),
+    )
+    if topics[0] == TRANSFER_TOPIC and len(topics) == 4:
+        # ERC-721 indexes all three arguments (an ERC-20 Transfer has 3 topics and is skipped)
+        sender, recipient = topic_address(topics[1]), topic_address(topics[2])
+        event = "mint" if sender == ZERO_ADDRESS else "transfer"
+        return ChainEvent(event, *position, sender=sender, recipient=recipient, token_id=int(topics[3], 16))
+    if topics[0] == REVENUE_DEPOSITED_TOPIC:
+        return ChainEvent("deposit", *position, amount=int(log["data"][2:66], 16))
+    return None
+
+
+def decode_logs(logs: List[dict]) -> List[ChainEvent]:
+    """Decoded events in chain order"""
+    events = [event for event in map(decode_log, logs) if event is not None]
+    return sorted(events, key=lambda event: (event.block_number, event.log_index))
@@ -2,6 +2,8 @@ import os
 from datetime import datetime
 from sqlalchemy import (
     create_engine,
+    event,
+    inspect,
     Column,
     Integer,
     String,
@@ -10,8 +12,13 @@ from sqlalchemy import (
     Boolean,
     DateTime,
     ForeignKey,
+    Index,
+    UniqueConstraint,
+    true,
 )
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from metrics import TimedQueuePool, instrument_engine
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./flowmint.db")
 
@@ -24,9 +31,101 @@ connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+# Async driver used by the request path: aiosqlite for SQLite, asyncpg for Postgres
+def async_database_url(url: str) -> str:
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    return url
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+# Optional read replicas, comma-separated and in the same form as DATABASE_URL
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# Connection pool tuning (per worker process)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 disables
+
+# SQLite pragmas applied to every new connection
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+pool_args = {
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "pool_recycle": DB_POOL_RECYCLE,
+}
+if not DATABASE_URL.startswith("sqlite:///:memory:") and DATABASE_URL != "sqlite://":
+    pool_args.update(poolclass=TimedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+
+async_connect_args = dict(connect_args)
+if DB_STATEMENT_TIMEOUT_MS and DATABASE_URL.startswith("postgresql"):
+    connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg"):
+        async_connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    else:
+        async_connect_args["options"] = connect_args["options"]
+
+# Sync engine is kept for schema creation and one-off scripts
+engine = create_engine(DATABASE_URL, connect_args=connect_args, pool_pre_ping=DB_POOL_PRE_PING)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=async_connect_args, **pool_args)
+instrument_engine(async_engine.sync_engine)
+# Each replica gets its own pool of the same size
+replica_engines = [
+    create_async_engine(async_database_url(url), connect_args=async_connect_args, **pool_args)
+    for url in DATABASE_REPLICA_URLS
+]
+for replica_engine in replica_engines:
+    instrument_engine(replica_engine.sync_engine)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    if SQLITE_JOURNAL_MODE:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    if SQLITE_SYNCHRONOUS:
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    for replica_engine in replica_engines:
+        event.listen(replica_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+
+def pool_stats():
+    """Snapshot of the request-path connection pool, plus one per read replica"""
+    stats = _pool_snapshot(async_engine.pool)
+    if replica_engines:
+        stats["replicas"] = [_pool_snapshot(replica_engine.pool) for replica_engine in replica_engines]
+    return stats
+
+
+def _pool_snapshot(pool):
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    if hasattr(pool, "size"):
+        stats["max_overflow"] = DB_MAX_OVERFLOW
+        stats["timeout"] = DB_POOL_TIMEOUT
+    return stats
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 
@@ -50,6 +149,12 @@ class User(Base):
     # Relationships
     projects = relationship("Project", back_populates="creator")
     investments = relationship("Investment", back_populates="investor")
+    
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_role_total_revenue", "role", "total_revenue"),
+        Index("ix_users_role_total_invested", "role", "total_invested"),
+    )
 
 class Project(Base):
     __tablename__ = "projects"
@@ -62,17 +167,24 @@ class Project(Base):
     current_revenue = Column(Float, default=0.0)
     nft_token_id = Column(Integer, unique=True)
     nft_contract_address = Column(String)
+    distributor_address = Column(String)  # the project's RevenueDistributor contract
     image_url = Column(String)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign keys
-    creator_id = Column(Integer, ForeignKey("users.id"))
+    creator_id = Column(Integer, ForeignKey("users.id"), index=True)
     
     # Relationships
     creator = relationship("User", back_populates="projects")
     investments = relationship("Investment", back_populates="project")
+    
+    __table_args__ = (
+        Index("ix_projects_is_active_category_created_at", "is_active", "category", "created_at", "id"),
+        Index("ix_projects_created_at_id", "created_at", "id"),
+        Index("ix_projects_is_active_current_revenue", "is_active", "current_revenue"),
+    )
 
 class Investment(Base):
     __tablename__ = "investments"
@@ -82,6 +194,8 @@ class Investment(Base):
     nft_token_id = Column(Integer, nullable=False)
     transaction_hash = Column(String, unique=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # False until the investment.created task has added it to the running totals
+    counters_applied = Column(Boolean, nullable=False, default=True, server_default=true())
     
     # Foreign keys
     investor_id = Column(Integer, ForeignKey("users.id"))
@@ -90,6 +204,12 @@ class Investment(Base):
     # Relationships
     investor = relationship("User", back_populates="investments")
     project = relationship("Project", back_populates="investments")
+    
+    __table_args__ = (
+        Index("ix_investments_project_id_created_at", "project_id", "created_at"),
+        Index("ix_investments_investor_id_created_at", "investor_id", "created_at"),
+        Index("ix_investments_created_at_id", "created_at", "id"),
+    )
 
 class RevenueDistribution(Base):
     __tablename__ = "revenue_distributions"
@@ -100,18 +220,127 @@ class RevenueDistribution(Base):
     distribution_percentage = Column(Float, nullable=False)
     transaction_hash = Column(String, unique=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    payouts = relationship("RevenuePayout", back_populates="distribution")
+    
+    __table_args__ = (
+        Index("ix_revenue_distributions_project_id_created_at", "project_id", "created_at"),
+    )
+
+class RevenuePayout(Base):
+    """One investor's pro-rata share of a RevenueDistribution"""
+    __tablename__ = "revenue_payouts"
+    
+    id = Column(Integer, primary_key=True)
+    distribution_id = Column(Integer, ForeignKey("revenue_distributions.id"), nullable=False, index=True)
+    investor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    amount = Column(Float, nullable=False)
+    share = Column(Float, nullable=False)  # fraction of the project's invested total
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    distribution = relationship("RevenueDistribution", back_populates="payouts")
+    
+    __table_args__ = (
+        Index("ix_revenue_payouts_investor_id_created_at", "investor_id", "created_at"),
+    )
+
+class InvestmentRollup(Base):
+    """Invested amount and count per entity per time bucket, maintained on write"""
+    __tablename__ = "investment_rollups"
+    
+    entity_type = Column(String, primary_key=True)  # "project", "creator" or "investor"
+    entity_id = Column(Integer, primary_key=True)
+    granularity = Column(String, primary_key=True)  # "hour" or "day"
+    bucket_start = Column(DateTime, primary_key=True)
+    amount = Column(Float, nullable=False, default=0.0)
+    investment_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index("ix_investment_rollups_window", "entity_type", "granularity", "bucket_start"),
+    )
+
+class OutboxTask(Base):
+    """Side effect recorded in the same transaction as the write that caused it (see tasks.py)"""
+    __tablename__ = "outbox_tasks"
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")  # JSON
+    dedupe_key = Column(String, unique=True)  # at most one task per key, e.g. one reconciliation per interval
+    status = Column(String, nullable=False, default="pending")  # "pending", "running", "done" or "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_outbox_tasks_status_run_after", "status", "run_after"),
+    )
+
+class CollectionVersion(Base):
+    """Bumped by database triggers on every write to a listed collection; list ETags are built from it"""
+    __tablename__ = "collection_versions"
+    
+    name = Column(String, primary_key=True)  # "projects", "users", "investments" or "investments:<project_id>"
+    version = Column(Integer, nullable=False, default=0)
+
+class IndexedBlock(Base):
+    """Block the chain indexer has processed; the highest one is its checkpoint (see indexer.py)"""
+    __tablename__ = "indexed_blocks"
+    
+    block_number = Column(Integer, primary_key=True, autoincrement=False)
+    block_hash = Column(String, nullable=False)  # compared with the chain to detect reorgs
+    indexed_at = Column(DateTime, default=datetime.utcnow)
+
+class ChainLog(Base):
+    """Contract log applied by the chain indexer and the rows it wrote, so a reorg can undo it"""
+    __tablename__ = "chain_logs"
+    
+    id = Column(Integer, primary_key=True)
+    block_number = Column(Integer, nullable=False, index=True)
+    transaction_hash = Column(String, nullable=False)
+    log_index = Column(Integer, nullable=False)
+    event = Column(String, nullable=False)  # "mint", "transfer" or "deposit"
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    token_id = Column(Integer)
+    from_user_id = Column(Integer, ForeignKey("users.id"))
+    to_user_id = Column(Integer, ForeignKey("users.id"))
+    # Rows this log created or moved; empty when it was already recorded through the API
+    investment_id = Column(Integer, ForeignKey("investments.id"))
+    distribution_id = Column(Integer, ForeignKey("revenue_distributions.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("transaction_hash", "log_index"),
+    )
 
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
+# Apply Alembic migrations
+def run_migrations():
+    """Upgrade the schema to the latest migration.
+
+    Databases created by create_all before migrations existed have tables but
+    no alembic_version, so they are stamped at the initial revision first and
+    only pick up the newer migrations.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    config.attributes["configure_logger"] = False
+
+    tables = inspect(engine).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        command.stamp(config, "0001")
+    command.upgrade(config, "head")
+
 # Database dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
-# Initialize database
-create_tables()
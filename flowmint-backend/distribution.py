@@ -0,0 +1,89 @@
+from datetime import datetime
+from typing import List
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import ChainLog, Investment, RevenueDistribution, RevenuePayout
+
+
+async def distribute_revenue(db: AsyncSession, distribution: RevenueDistribution) -> List[int]:
+    """Record every investor's pro-rata payout for a project distribution.
+
+    ``distribution.amount * distribution_percentage / 100`` is split by each
+    investor's share of the project's invested total. The shares and payout
+    rows are computed by a single INSERT ... SELECT with a window total, so
+    the database does the work in one pass over the project's investments
+    and sees one consistent snapshot. Returns the ids of the investors paid,
+    none when the project has no investments or they total 0; the caller
+    commits.
+    """
+    now = datetime.utcnow()
+    distribution.created_at = now
+    db.add(distribution)
+    await db.flush()
+
+    investor_pool = distribution.amount * distribution.distribution_percentage / 100
+    invested = func.sum(Investment.amount)
+    # NULL rather than a division by zero when the investments total 0; those rows are skipped
+    share = invested / func.nullif(func.sum(invested).over(), 0)
+    shares = (
+        select(Investment.investor_id, share.label("share"))
+        .where(Investment.project_id == distribution.project_id, Investment.investor_id.is_not(None))
+        .group_by(Investment.investor_id)
+        .subquery()
+    )
+    per_investor = select(
+        literal(distribution.id),
+        shares.c.investor_id,
+        literal(distribution.project_id),
+        shares.c.share * investor_pool,
+        shares.c.share,
+        literal(now),
+    ).where(shares.c.share.is_not(None))
+    return await _insert_payouts(db, per_investor)
+
+
+async def distribute_to_token_holders(db: AsyncSession, distribution: RevenueDistribution, max_supply: int) -> List[int]:
+    """Record the payouts of a RevenueDistributor deposit, the way the contract pays them.
+
+    Every token is worth ``distribution.amount / max_supply`` to whoever
+    holds it now. Tokens are the project's investments minted on chain
+    (journaled in ``chain_logs``); investments recorded only through the API
+    hold none and get nothing, and the share of unminted tokens stays unpaid.
+    Returns the ids of the investors paid; the caller commits.
+    """
+    now = datetime.utcnow()
+    distribution.created_at = now
+    db.add(distribution)
+    await db.flush()
+    if max_supply <= 0:
+        return []
+
+    minted = select(ChainLog.transaction_hash).where(ChainLog.event == "mint", ChainLog.project_id == distribution.project_id)
+    tokens = func.count(Investment.id)
+    per_investor = (
+        select(
+            literal(distribution.id),
+            Investment.investor_id,
+            literal(distribution.project_id),
+            tokens * (distribution.amount / max_supply),
+            tokens * (1.0 / max_supply),
+            literal(now),
+        )
+        .where(
+            Investment.project_id == distribution.project_id,
+            Investment.investor_id.is_not(None),
+            Investment.transaction_hash.in_(minted),
+        )
+        .group_by(Investment.investor_id)
+    )
+    return await _insert_payouts(db, per_investor)
+
+
+async def _insert_payouts(db: AsyncSession, per_investor) -> List[int]:
+    result = await db.execute(
+        insert(RevenuePayout).from_select(
+            ["distribution_id", "investor_id", "project_id", "amount", "share", "created_at"],
+            per_investor,
+        ).returning(RevenuePayout.investor_id)
+    )
+    return list(result.scalars())
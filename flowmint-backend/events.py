@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+from collections import defaultdict
+from typing import Iterable
+
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "100"))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get("EVENT_HEARTBEAT_SECONDS", "15"))
+
+
+class Subscription:
+    """A subscriber's bounded event queue.
+
+    When the client reads slower than events arrive, the oldest queued events
+    are dropped rather than blocking publishers, and ``lagged`` tells the
+    stream to send a ``resync`` event so the client re-fetches full state once.
+    """
+
+    def __init__(self, broker, topics, max_queue: int):
+        self.broker = broker
+        self.topics = set(topics)
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.lagged = False
+
+    def offer(self, event: dict) -> bool:
+        """Queue an event; returns False if an older event had to be dropped"""
+        dropped = self.queue.full()
+        if dropped:
+            self.queue.get_nowait()
+            self.lagged = True
+        self.queue.put_nowait(event)
+        return not dropped
+
+    async def get(self, timeout: float):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """In-process pub/sub keyed by topic, e.g. ``project:12`` or ``user:3``.
+
+    Events only reach subscribers connected to this worker process.
+    """
+
+    def __init__(self, max_queue: int = EVENT_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(self, topics, self.max_queue)
+        for topic in subscription.topics:
+            self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topics: Iterable[str], event_type: str, data: dict):
+        """Fan an event out to every subscriber of any of ``topics``, once each"""
+        self.published += 1
+        targets = set()
+        for topic in set(topics):
+            targets.update(self._subscribers.get(topic, ()))
+        if not targets:
+            return
+        event = {"type": event_type, "data": data}
+        for subscription in targets:
+            if not subscription.offer(event):
+                self.dropped += 1
+        self.delivered += len(targets)
+
+    def stats(self):
+        subscriptions = {s for subscribers in self._subscribers.values() for s in subscribers}
+        return {
+            "subscribers": len(subscriptions),
+            "topics": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+broker = EventBroker()
+
+
+def format_sse(event_type: str, data) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def publish_investment(investment: dict, creator_id=None):
+    """Announce a new investment to its project, investor and creator"""
+    topics = [f"project:{investment['project_id']}", f"user:{investment['investor_id']}"]
+    if creator_id is not None:
+        topics.append(f"user:{creator_id}")
+    broker.publish(topics, "investment.created", investment)
+
+
+def publish_project(project: dict, event_type: str = "project.updated"):
+    broker.publish([f"project:{project['id']}", f"user:{project['creator_id']}"], event_type, project)
+
+
+def publish_distribution(distribution: dict, investor_ids: Iterable[int] = ()):
+    """Announce a distribution to its project and to every investor it paid"""
+    topics = [f"project:{distribution['project_id']}"] + [f"user:{investor_id}" for investor_id in investor_ids]
+    broker.publish(topics, "distribution.created", distribution)
@@ -0,0 +1,87 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import collection_version
+
+HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", "0"))
+CACHE_CONTROL = f"public, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate"
+
+
+def collection_etag(request: Request, version: str) -> str:
+    """Weak ETag for a list response: the collection's version plus the exact path and query"""
+    query = hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:12]
+    return f'W/"{version}-{query}"'
+
+
+def entity_etag(data: dict) -> str:
+    """Weak ETag for a single row; every write to users/projects bumps ``updated_at``"""
+    return f'W/"{data["id"]}-{_updated_at(data).timestamp():.6f}"'
+
+
+def _updated_at(data: dict) -> datetime:
+    updated_at = data["updated_at"]
+    if isinstance(updated_at, str):
+        updated_at = datetime.fromisoformat(updated_at)
+    return updated_at.replace(tzinfo=timezone.utc)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def is_fresh(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """True when the client's cached copy is still current (RFC 9110 §13.2.2 precedence)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def cache_headers(response: Response, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return response
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return cache_headers(Response(status_code=304), etag, last_modified)
+
+
+async def conditional_collection(request: Request, db: AsyncSession, collection: str):
+    """Returns ``(etag, 304 response or None)`` for a list endpoint.
+
+    The collection's version is one primary-key lookup, so a matching
+    ``If-None-Match`` is answered with a 304 before the list is fetched. It
+    is read through ``db`` ahead of the list, so the etag is never newer
+    than the rows sent with it, even from a lagging replica.
+    """
+    etag = collection_etag(request, str(await collection_version(db, collection)))
+    if is_fresh(request, etag):
+        return etag, not_modified(etag)
+    return etag, None
+
+
+def conditional_entity(request: Request, response: Response, data: dict) -> Optional[Response]:
+    """Sets ETag/Last-Modified on ``response``; returns a 304 if the client is up to date"""
+    etag, last_modified = entity_etag(data), _updated_at(data)
+    if is_fresh(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    cache_headers(response, etag, last_modified)
+    return None
@@ -0,0 +1,348 @@
+"""Chain indexer: records FlowMint contract activity as investments and distributions.
+
+    python indexer.py                  # follow the chain until stopped
+    python indexer.py --once           # catch up to the confirmed head and exit
+    python indexer.py --from-block N   # rescan from block N; logs already applied are skipped
+
+Polls INDEXER_RPC_URL for the logs of every project's FlowMintNFT
+(``nft_contract_address``) and RevenueDistributor (``distributor_address``),
+INDEXER_BLOCK_RANGE blocks at a time and INDEXER_CONFIRMATIONS blocks behind
+the head. A range costs one ``eth_getLogs`` and one batched request for its
+block headers, and is applied in one transaction together with the new
+checkpoint, so a crash never applies a range twice.
+
+- A ``Transfer`` from the zero address is a mint: an investment by the
+  recipient at the distributor's ``mintPrice``, timestamped with the block.
+  Wallets that never registered are added as investors.
+- Any other ``Transfer`` hands the investment, and its ``total_invested``,
+  to the new owner.
+- ``RevenueDeposited`` is a distribution of the whole deposit, paid out as
+  the contract does: ``amount / maxSupply`` per token, to each token's holder
+  at that point. Investments recorded only through the API hold no token.
+
+Rows already recorded through the API under the same transaction hash are
+left alone. Every applied log is journaled in ``chain_logs``. When the
+checkpoint's block hash no longer matches the chain, the indexer finds the
+newest checkpoint that still does (or, before any were pruned, the start
+block), undoes the journaled logs above it and scans again from there.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, ChainLog, IndexedBlock, Investment, Project, RevenueDistribution, RevenuePayout, User
+from cache import invalidate_investment_targets, invalidate_users
+from chain import JsonRpc, decode_logs, MAX_SUPPLY_SELECTOR, MINT_PRICE_SELECTOR, REVENUE_DEPOSITED_TOPIC, TRANSFER_TOPIC
+from distribution import distribute_to_token_holders
+from ledger import apply_investment_deltas
+
+INDEXER_START_BLOCK = int(os.environ.get("INDEXER_START_BLOCK", "0"))
+INDEXER_BLOCK_RANGE = int(os.environ.get("INDEXER_BLOCK_RANGE", "2000"))
+INDEXER_CONFIRMATIONS = int(os.environ.get("INDEXER_CONFIRMATIONS", "12"))
+INDEXER_POLL_SECONDS = float(os.environ.get("INDEXER_POLL_SECONDS", "5"))
+# Checkpoints kept to find where a reorg forked; older ones are pruned
+INDEXER_KEEP_CHECKPOINTS = int(os.environ.get("INDEXER_KEEP_CHECKPOINTS", "256"))
+# USDC has 6 decimals
+INDEXER_TOKEN_DECIMALS = int(os.environ.get("INDEXER_TOKEN_DECIMALS", "6"))
+
+logger = logging.getLogger("flowmint.indexer")
+
+
+class ReorgTooDeep(Exception):
+    pass
+
+
+class Touched:
+    """What a transaction changed, for cache invalidation once it commits"""
+
+    def __init__(self):
+        self.deltas = []
+        self.user_ids = set()
+
+    async def invalidate(self):
+        if self.deltas:
+            await invalidate_investment_targets(self.deltas)
+        if self.user_ids:
+            await invalidate_users(self.user_ids)
+
+
+class Indexer:
+    def __init__(self, rpc: JsonRpc, session_factory=AsyncSessionLocal, start_block: int = INDEXER_START_BLOCK):
+        self.rpc = rpc
+        self.session_factory = session_factory
+        self.start_block = start_block
+        self._terms = {}
+
+    async def run(self, once: bool = False):
+        failures = 0
+        while True:
+            try:
+                more = await self.step()
+                failures = 0
+            except ReorgTooDeep:
+                raise
+            except Exception as exc:
+                failures += 1
+                delay = min(INDEXER_POLL_SECONDS * 2 ** failures, 300)
+                logger.warning("Indexing failed, retrying in %.0fs: %r", delay, exc)
+                await asyncio.sleep(delay)
+                continue
+            if more:
+                continue
+            if once:
+                return
+            await asyncio.sleep(INDEXER_POLL_SECONDS)
+
+    async def step(self) -> bool:
+        """Index the next range; True if there may be more to do right away"""
+        head = int(await self.rpc.call("eth_blockNumber"), 16)
+        async with self.session_factory() as db:
+            checkpoint = await db.scalar(select(IndexedBlock).order_by(IndexedBlock.block_number.desc()).limit(1))
+            if checkpoint is not None:
+                (block,) = await self._headers([checkpoint.block_number])
+                if block is None or block["hash"] != checkpoint.block_hash:
+                    await self.rewind(db)
+                    return True
+
+            start = checkpoint.block_number + 1 if checkpoint else self.start_block
+            end = min(start + INDEXER_BLOCK_RANGE - 1, head - INDEXER_CONFIRMATIONS)
+            if end < start:
+                return False
+
+            contracts = await self._contracts(db)
+            events = []
+            if contracts:
+                events = decode_logs(await self.rpc.call("eth_getLogs", {
+                    "fromBlock": hex(start),
+                    "toBlock": hex(end),
+                    "address": sorted(contracts),
+                    "topics": [[TRANSFER_TOPIC, REVENUE_DEPOSITED_TOPIC]],
+                }))
+                # Transfers only count from NFT contracts, deposits from distributors
+                events = [event for event in events if contracts[event.address][1] == ("distributor" if event.event == "deposit" else "nft")]
+            numbers = sorted({end} | {event.block_number for event in events})
+            blocks = dict(zip(numbers, await self._headers(numbers)))
+            if any(blocks[number] is None for number in numbers) or any(blocks[event.block_number]["hash"] != event.block_hash for event in events):
+                logger.warning("Blocks %d-%d changed while being read; fetching them again", start, end)
+                return False
+            await self._load_terms([contracts[event.address][0] for event in events if event.event != "transfer"])
+
+            touched = Touched()
+            await self._apply(db, events, contracts, blocks, touched)
+            db.add(IndexedBlock(block_number=end, block_hash=blocks[end]["hash"]))
+            oldest_kept = (
+                select(IndexedBlock.block_number).order_by(IndexedBlock.block_number.desc())
+                .offset(INDEXER_KEEP_CHECKPOINTS - 1).limit(1).scalar_subquery()
+            )
+            await db.flush()
+            await db.execute(delete(IndexedBlock).where(IndexedBlock.block_number < oldest_kept))
+            await db.commit()
+        await touched.invalidate()
+        if events:
+            logger.info("Indexed blocks %d-%d: %d logs", start, end, len(events))
+        return end < head - INDEXER_CONFIRMATIONS
+
+    async def rewind(self, db: AsyncSession):
+        """Undo everything above the newest checkpoint still on the chain"""
+        stored = (await db.execute(
+            select(IndexedBlock.block_number, IndexedBlock.block_hash).order_by(IndexedBlock.block_number.desc())
+        )).all()
+        blocks = await self._headers([number for number, _ in stored])
+        ancestor = next((number for (number, block_hash), block in zip(stored, blocks) if block and block["hash"] == block_hash), None)
+        if ancestor is None and len(stored) < INDEXER_KEEP_CHECKPOINTS:
+            # Nothing pruned yet, so the block before the start is the implicit first checkpoint
+            ancestor = self.start_block - 1
+        if ancestor is None:
+            raise ReorgTooDeep(
+                f"No kept checkpoint (oldest: block {stored[-1].block_number}) is on the chain any more; "
+                "rescan with --from-block"
+            )
+
+        touched = Touched()
+        undone = await self._undo(db, ancestor, touched)
+        await db.execute(delete(IndexedBlock).where(IndexedBlock.block_number > ancestor))
+        await db.commit()
+        await touched.invalidate()
+        logger.warning("Chain reorganised: rewound from block %d to %d and undid %d logs", stored[0].block_number, ancestor, undone)
+
+    async def rescan_from(self, block_number: int):
+        """Forget the checkpoints so the next step starts at ``block_number``"""
+        async with self.session_factory() as db:
+            await db.execute(delete(IndexedBlock))
+            await db.commit()
+        self.start_block = block_number
+
+    async def _headers(self, numbers):
+        return await self.rpc.batch([("eth_getBlockByNumber", [hex(number), False]) for number in numbers])
+
+    async def _contracts(self, db: AsyncSession) -> Dict[str, tuple]:
+        """Watched address -> (project row, "nft" or "distributor")"""
+        projects = (await db.execute(
+            select(Project.id, Project.creator_id, Project.distributor_address, Project.nft_contract_address)
+            .where(or_(Project.nft_contract_address.is_not(None), Project.distributor_address.is_not(None)))
+        )).all()
+        contracts = {}
+        for project in projects:
+            if project.nft_contract_address:
+                contracts[project.nft_contract_address.lower()] = (project, "nft")
+            if project.distributor_address:
+                contracts[project.distributor_address.lower()] = (project, "distributor")
+        return contracts
+
+    async def _load_terms(self, projects):
+        """Fetch ``mintPrice`` and ``maxSupply`` of distributors not seen yet, in one batch; they never change"""
+        distributors = sorted({project.distributor_address for project in projects if project.distributor_address} - self._terms.keys())
+        values = await self.rpc.batch([
+            ("eth_call", [{"to": address, "data": selector}, "latest"])
+            for address in distributors for selector in (MINT_PRICE_SELECTOR, MAX_SUPPLY_SELECTOR)
+        ])
+        for address, price, max_supply in zip(distributors, values[::2], values[1::2]):
+            self._terms[address] = (int(price, 16) / 10 ** INDEXER_TOKEN_DECIMALS, int(max_supply, 16))
+
+    def _mint_price(self, project) -> float:
+        # Without a distributor there is no price to read; the mint is still recorded
+        return self._terms.get(project.distributor_address, (0.0, 0))[0]
+
+    async def _apply(self, db: AsyncSession, events, contracts, blocks, touched: Touched):
+        if not events:
+            return
+        hashes = {event.transaction_hash for event in events}
+        journaled = set((await db.execute(
+            select(ChainLog.transaction_hash, ChainLog.log_index).where(ChainLog.transaction_hash.in_(hashes))
+        )).all())
+        events = [event for event in events if (event.transaction_hash, event.log_index) not in journaled]
+        investments = dict((await db.execute(
+            select(Investment.transaction_hash, Investment.id).where(Investment.transaction_hash.in_(hashes))
+        )).all())
+        distributions = set((await db.scalars(
+            select(RevenueDistribution.transaction_hash).where(RevenueDistribution.transaction_hash.in_(hashes))
+        )).all())
+        users = await self._user_ids(db, {event.recipient for event in events if event.recipient})
+
+        deltas_by_time = defaultdict(list)
+        for event in events:
+            project, _ = contracts[event.address]
+            log = ChainLog(
+                block_number=event.block_number, transaction_hash=event.transaction_hash, log_index=event.log_index,
+                event=event.event, project_id=project.id, token_id=event.token_id,
+            )
+            if event.event == "mint":
+                log.to_user_id = users[event.recipient]
+                if event.transaction_hash not in investments:
+                    amount = self._mint_price(project)
+                    invested_at = datetime.utcfromtimestamp(int(blocks[event.block_number]["timestamp"], 16))
+                    log.investment_id = investments[event.transaction_hash] = await db.scalar(
+                        insert(Investment).values(
+                            amount=amount, nft_token_id=event.token_id, transaction_hash=event.transaction_hash,
+                            investor_id=log.to_user_id, project_id=project.id, created_at=invested_at,
+                        ).returning(Investment.id)
+                    )
+                    deltas_by_time[invested_at].append((project.id, log.to_user_id, project.creator_id, amount))
+            elif event.event == "transfer":
+                await self._transfer(db, log, users[event.recipient], touched)
+            elif event.transaction_hash not in distributions:
+                distribution = RevenueDistribution(
+                    project_id=project.id, amount=event.amount / 10 ** INDEXER_TOKEN_DECIMALS,
+                    distribution_percentage=100.0, transaction_hash=event.transaction_hash,
+                )
+                # Deposits only come from distributors, so the terms are loaded
+                await distribute_to_token_holders(db, distribution, self._terms[project.distributor_address][1])
+                log.distribution_id = distribution.id
+                distributions.add(event.transaction_hash)
+            db.add(log)
+            # Sessions don't autoflush, and later logs in the range look this one up
+            await db.flush()
+
+        for invested_at, deltas in deltas_by_time.items():
+            await apply_investment_deltas(db, deltas, invested_at)
+            touched.deltas.extend(deltas)
+
+    async def _transfer(self, db: AsyncSession, log: ChainLog, new_owner: int, touched: Touched):
+        columns = (Investment.id, Investment.investor_id, Investment.amount)
+        mint_hash = await db.scalar(
+            select(ChainLog.transaction_hash)
+            .where(ChainLog.event == "mint", ChainLog.project_id == log.project_id, ChainLog.token_id == log.token_id)
+        )
+        if mint_hash is not None:
+            # The mint's investment, whether the indexer or the API recorded it
+            candidates = select(*columns).where(Investment.transaction_hash == mint_hash)
+        else:
+            # Minted before the start block: trust an API-recorded token id only if it is unambiguous
+            candidates = select(*columns).where(Investment.project_id == log.project_id, Investment.nft_token_id == log.token_id).limit(2)
+        investments = (await db.execute(candidates)).all()
+        if len(investments) != 1:
+            return
+        (investment,) = investments
+        log.investment_id, log.from_user_id, log.to_user_id = investment.id, investment.investor_id, new_owner
+        await _move_investment(db, investment.id, investment.amount, investment.investor_id, new_owner, touched)
+
+    async def _undo(self, db: AsyncSession, ancestor: int, touched: Touched) -> int:
+        logs = (await db.scalars(
+            select(ChainLog).where(ChainLog.block_number > ancestor).order_by(ChainLog.id.desc())
+        )).all()
+        await db.execute(delete(ChainLog).where(ChainLog.block_number > ancestor))
+        for log in logs:
+            if log.event == "mint" and log.investment_id is not None:
+                investment = await db.get(Investment, log.investment_id)
+                delta = (investment.project_id, investment.investor_id, await db.scalar(select(Project.creator_id).where(Project.id == investment.project_id)), -investment.amount)
+                await apply_investment_deltas(db, [delta], investment.created_at)
+                touched.deltas.append(delta)
+                await db.delete(investment)
+            elif log.event == "transfer" and log.investment_id is not None:
+                amount = await db.scalar(select(Investment.amount).where(Investment.id == log.investment_id))
+                await _move_investment(db, log.investment_id, amount, log.to_user_id, log.from_user_id, touched)
+            elif log.event == "deposit" and log.distribution_id is not None:
+                await db.execute(delete(RevenuePayout).where(RevenuePayout.distribution_id == log.distribution_id))
+                await db.execute(delete(RevenueDistribution).where(RevenueDistribution.id == log.distribution_id))
+        return len(logs)
+
+    async def _user_ids(self, db: AsyncSession, addresses) -> Dict[str, int]:
+        """User id per (lowercase) wallet address, registering unknown wallets as investors"""
+        found = dict((await db.execute(select(User.wallet_address, User.id).where(User.wallet_address.in_(list(addresses))))).all())
+        for address in sorted(set(addresses) - found.keys()):
+            found[address] = await db.scalar(insert(User).values(wallet_address=address, role="investor").returning(User.id))
+        return found
+
+
+async def _move_investment(db: AsyncSession, investment_id: int, amount: float, old_owner: Optional[int], new_owner: int, touched: Touched):
+    if old_owner == new_owner:
+        return
+    await db.execute(update(Investment).where(Investment.id == investment_id).values(investor_id=new_owner))
+    now = datetime.utcnow()
+    # Ascending ids, like apply_investment_deltas, to keep lock order consistent
+    for user_id, change in sorted(((old_owner, -amount), (new_owner, amount)), key=lambda pair: pair[0] or 0):
+        if user_id is None:
+            continue
+        await db.execute(
+            update(User).where(User.id == user_id)
+            .values(total_invested=func.coalesce(User.total_invested, 0.0) + change, updated_at=now)
+        )
+        touched.user_ids.add(user_id)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="exit once caught up with the confirmed head")
+    parser.add_argument("--from-block", type=int, help="rescan from this block")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # httpx logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    rpc = JsonRpc()
+    indexer = Indexer(rpc)
+    try:
+        if args.from_block is not None:
+            await indexer.rescan_from(args.from_block)
+        await indexer.run(once=args.once)
+    finally:
+        await rpc.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
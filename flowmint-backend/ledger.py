@@ -0,0 +1,196 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Investment, Project, User
+from models import InvestmentBatchItem, InvestmentBatchResult, InvestmentBatchRowError, InvestmentResponse
+from cache import invalidate_investment_targets
+from rollups import bump_rollups, rollup_increments
+from events import publish_investment
+from serialization import columns_for
+
+# (project_id, investor_id, creator_id, amount)
+InvestmentDelta = Tuple[int, int, Optional[int], float]
+
+
+async def apply_investment_deltas(db: AsyncSession, deltas: Iterable[InvestmentDelta], invested_at: Optional[datetime] = None):
+    """Add invested amounts to the project, investor and creator running totals.
+
+    Amounts are summed per row first and each row gets a single
+    ``UPDATE ... SET x = x + :amount``, so concurrent writers never lose an
+    increment. Rows are touched in a fixed order (projects, investors,
+    creators; ascending id) to keep lock acquisition deadlock-free. The
+    hour/day rollup buckets of ``invested_at`` (default now) are bumped in
+    the same transaction.
+    """
+    project_totals = defaultdict(float)
+    investor_totals = defaultdict(float)
+    creator_totals = defaultdict(float)
+    deltas = list(deltas)
+    for project_id, investor_id, creator_id, amount in deltas:
+        project_totals[project_id] += amount
+        investor_totals[investor_id] += amount
+        if creator_id is not None:
+            creator_totals[creator_id] += amount
+
+    now = datetime.utcnow()
+    for project_id in sorted(project_totals):
+        await db.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(current_revenue=Project.current_revenue + project_totals[project_id], updated_at=now)
+        )
+    for investor_id in sorted(investor_totals):
+        await db.execute(
+            update(User)
+            .where(User.id == investor_id)
+            .values(total_invested=User.total_invested + investor_totals[investor_id], updated_at=now)
+        )
+    for creator_id in sorted(creator_totals):
+        await db.execute(
+            update(User)
+            .where(User.id == creator_id)
+            .values(total_revenue=User.total_revenue + creator_totals[creator_id], updated_at=now)
+        )
+
+    await bump_rollups(db, rollup_increments(deltas, invested_at or now))
+
+
+# Totals within this of the recomputed sum are float noise, not drift
+RECONCILE_TOLERANCE = 0.01
+
+
+async def reconcile_counters(db: AsyncSession) -> Tuple[List[int], List[int]]:
+    """Reset running totals that drifted from the investments they count.
+
+    Recomputes ``current_revenue``, ``total_invested`` and ``total_revenue``
+    from the investments whose counters were applied (investments still
+    waiting on their task are left out, as the task will add them). Each fix
+    is a compare-and-set against the value read alongside the sums, so a
+    total that an investment task or another reconciliation changed in the
+    meantime is left for the next run rather than overwritten. Returns the
+    corrected project and user ids; the caller commits.
+    """
+    applied = Investment.counters_applied.is_(True)
+    project_sums = select(Investment.project_id.label("id"), func.sum(Investment.amount).label("total")).where(applied).group_by(Investment.project_id)
+    investor_sums = select(Investment.investor_id.label("id"), func.sum(Investment.amount).label("total")).where(applied).group_by(Investment.investor_id)
+    creator_sums = (
+        select(Project.creator_id.label("id"), func.sum(Investment.amount).label("total"))
+        .join(Project, Project.id == Investment.project_id).where(applied).group_by(Project.creator_id)
+    )
+    projects = await _reconcile(db, Project.__table__, "current_revenue", project_sums.subquery())
+    users = await _reconcile(db, User.__table__, "total_invested", investor_sums.subquery())
+    users += await _reconcile(db, User.__table__, "total_revenue", creator_sums.subquery())
+    return projects, sorted(set(users))
+
+
+async def _reconcile(db: AsyncSession, table, column_name: str, sums) -> List[int]:
+    column = table.c[column_name]
+    expected = func.coalesce(sums.c.total, 0.0)
+    drifted = (await db.execute(
+        select(table.c.id, column, expected)
+        .select_from(table.outerjoin(sums, sums.c.id == table.c.id))
+        .where(func.abs(expected - func.coalesce(column, 0.0)) > RECONCILE_TOLERANCE)
+    )).all()
+    corrected = []
+    now = datetime.utcnow()
+    for row_id, observed, total in drifted:
+        observed_matches = column.is_(None) if observed is None else column == observed
+        result = await db.execute(
+            update(table).where(table.c.id == row_id, observed_matches).values({column_name: total, "updated_at": now})
+        )
+        if result.rowcount:
+            corrected.append(row_id)
+    return corrected
+
+
+# Rows per bulk INSERT; keeps IN lists and bind parameters well inside driver limits
+INGEST_CHUNK_SIZE = 1000
+# Tries per chunk when concurrent writers keep storing its hashes first
+INGEST_MAX_ATTEMPTS = 5
+
+
+async def ingest_investments(db: AsyncSession, items: Sequence[Tuple[int, InvestmentBatchItem]], result: InvestmentBatchResult):
+    """Bulk-insert ``(row_index, item)`` pairs and commit them chunk by chunk.
+
+    Rows whose transaction hash is already stored (or repeated earlier in the
+    batch) are reported as duplicates, or as errors when the stored row
+    differs. Unknown investors/projects are reported as errors. Everything else
+    is inserted with one executemany per chunk and the counters are bumped once
+    per project/user. A chunk that still conflicts after INGEST_MAX_ATTEMPTS
+    is reported row by row instead of failing the request.
+    """
+    for start in range(0, len(items), INGEST_CHUNK_SIZE):
+        chunk = items[start:start + INGEST_CHUNK_SIZE]
+        for _ in range(INGEST_MAX_ATTEMPTS):
+            try:
+                await _ingest_chunk(db, chunk, result)
+                break
+            except IntegrityError:
+                # A concurrent writer stored one of our hashes between the check and
+                # the insert; the next attempt sees it and reports it as a duplicate.
+                await db.rollback()
+        else:
+            result.errors.extend(
+                InvestmentBatchRowError(index=index, transaction_hash=item.transaction_hash, detail="Conflicted with concurrent writes; send it again")
+                for index, item in chunk
+            )
+
+
+async def _ingest_chunk(db: AsyncSession, chunk, result: InvestmentBatchResult):
+    hashes = {item.transaction_hash for _, item in chunk if item.transaction_hash}
+    existing = {}
+    if hashes:
+        rows = await db.execute(
+            select(Investment.transaction_hash, Investment.investor_id, Investment.project_id, Investment.amount)
+            .where(Investment.transaction_hash.in_(hashes))
+        )
+        existing = {row.transaction_hash: (row.investor_id, row.project_id, row.amount) for row in rows}
+
+    investor_ids = {item.investor_id for _, item in chunk}
+    investors = set((await db.scalars(
+        select(User.id).where(User.id.in_(investor_ids), User.role == "investor")
+    )).all())
+    project_ids = {item.project_id for _, item in chunk}
+    creators = dict((await db.execute(
+        select(Project.id, Project.creator_id).where(Project.id.in_(project_ids))
+    )).all())
+
+    duplicates, errors, rows, deltas = [], [], [], []
+    for index, item in chunk:
+        tx_hash = item.transaction_hash
+        if tx_hash and tx_hash in existing:
+            if existing[tx_hash] == (item.investor_id, item.project_id, item.amount):
+                duplicates.append(InvestmentBatchRowError(index=index, transaction_hash=tx_hash, detail="Transaction hash already recorded"))
+            else:
+                errors.append(InvestmentBatchRowError(index=index, transaction_hash=tx_hash, detail="Transaction hash already recorded for a different investment"))
+            continue
+        if item.investor_id not in investors:
+            errors.append(InvestmentBatchRowError(index=index, transaction_hash=tx_hash, detail="Investor not found"))
+            continue
+        if item.project_id not in creators:
+            errors.append(InvestmentBatchRowError(index=index, transaction_hash=tx_hash, detail="Project not found"))
+            continue
+
+        if tx_hash:
+            existing[tx_hash] = (item.investor_id, item.project_id, item.amount)
+        rows.append(item.dict())
+        deltas.append((item.project_id, item.investor_id, creators[item.project_id], item.amount))
+
+    inserted = []
+    if rows:
+        # RETURNING in parameter order, so each stored row (with its id and created_at) lines up with its delta
+        inserted = (await db.execute(
+            insert(Investment).returning(*columns_for(InvestmentResponse, Investment), sort_by_parameter_order=True), rows
+        )).all()
+        await apply_investment_deltas(db, deltas)
+    await db.commit()
+    await invalidate_investment_targets(deltas)
+    for row, (_, _, creator_id, _) in zip(inserted, deltas):
+        publish_investment(InvestmentResponse.model_validate(row, from_attributes=True).model_dump(mode="json"), creator_id=creator_id)
+
+    result.inserted += len(rows)
+    result.duplicates.extend(duplicates)
+    result.errors.extend(errors)
@@ -1,19 +1,38 @@
+import time
+import_started = time.perf_counter()
+
+import logging
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routes.users import router as users_router
 from routes.projects import router as projects_router
-from database import get_db, User, Project, Investment, Base, engine
-from sqlalchemy.orm import Session
-import random
-from datetime import datetime
+from routes.leaderboard import router as leaderboard_router
+from routes.rollups import router as rollups_router
+from routes.events import router as events_router
+from routes.exports import router as exports_router
+from database import pool_stats
+from cache import cache
+from events import broker
+from metrics import MetricsMiddleware, Gauge, registry, render_metrics
+from ratelimit import RateLimitMiddleware, rejected
+from replicas import ReadYourWritesMiddleware, router as replica_router
+from tasks import queue as task_queue
 import os
 
 app = FastAPI(title="FlowMint API", version="1.0.0")
+# uvicorn only configures its own loggers, so boot messages go through its error log
+logger = logging.getLogger("uvicorn.error")
+boot_seconds = None
 
 # Configure CORS: allow localhost for dev, can override with env var for prod
 default_origins = "http://localhost:3000,http://127.0.0.1:3000"
 origins = os.environ.get("CORS_ORIGINS", default_origins).split(",")
 
+# Added first so they run inside CORS: browsers need CORS headers to read a 429
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,  # Frontend URLs
@@ -22,154 +41,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
+registry.extend([
+    Gauge("flowmint_db_pool_connections", "Request-path pool connections by state", ("state",),
+          lambda: {(state,): value for state, value in pool_stats().items() if state in ("size", "checkedin", "checkedout", "overflow")}),
+    Gauge("flowmint_cache_lookups", "Cache lookups since start by result", ("result",),
+          lambda: {("hit",): cache.stats()["hits"], ("miss",): cache.stats()["misses"]}),
+    Gauge("flowmint_event_subscribers", "Connected event stream clients", (),
+          lambda: {(): broker.stats()["subscribers"]}),
+    Gauge("flowmint_db_reads", "Read-only requests since start by where they were sent", ("target",),
+          lambda: {(target,): count for target, count in replica_router.stats()["reads"].items()}),
+    Gauge("flowmint_rate_limited_requests", "Requests rejected with 429 since start", ("route",),
+          lambda: {(route,): count for route, count in rejected.items()}),
+    Gauge("flowmint_tasks_processed", "Outbox tasks run by this worker since start by result", ("result",),
+          lambda: {(result,): count for result, count in task_queue.results.items()}),
+    Gauge("flowmint_boot_seconds", "Time from importing main to the app being ready", (),
+          lambda: {(): boot_seconds} if boot_seconds is not None else {}),
+])
+
 # Include routers
 app.include_router(users_router, prefix="/api")
 app.include_router(projects_router, prefix="/api")
+app.include_router(leaderboard_router, prefix="/api")
+app.include_router(rollups_router, prefix="/api")
+app.include_router(events_router, prefix="/api")
+app.include_router(exports_router, prefix="/api")
 
 @app.get("/")
 async def root():
     return {"message": "FlowMint API is running!", "version": "1.0.0"}
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize demo data on startup"""
-    # Ensure database tables exist (important on fresh deploys)
-    Base.metadata.create_all(bind=engine)
-
-    db = next(get_db())
-
-    # Check if demo data already exists
-    if db.query(User).count() > 0:
-        db.close()
-        return
-
-    # Create demo users
-    demo_users = [
-        {
-            "wallet_address": "0x1234567890123456789012345678901234567890",
-            "username": "alice_creator",
-            "email": "alice@example.com",
-            "role": "creator",
-            "bio": "AI Artist creating unique digital masterpieces",
-            "profile_image_url": "https://images.unsplash.com/photo-1494790108755-2616b612b786?w=150&h=150&fit=crop&crop=face"
-        },
-        {
-            "wallet_address": "0x2345678901234567890123456789012345678901",
-            "username": "bob_creator",
-            "email": "bob@example.com",
-            "role": "creator",
-            "bio": "Music producer and composer",
-            "profile_image_url": "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=150&h=150&fit=crop&crop=face"
-        },
-        {
-            "wallet_address": "0x3456789012345678901234567890123456789012",
-            "username": "charlie_investor",
-            "email": "charlie@example.com",
-            "role": "investor",
-            "bio": "Crypto investor and NFT enthusiast",
-            "profile_image_url": "https://images.unsplash.com/photo-1472099645785-5658abf4ff4e?w=150&h=150&fit=crop&crop=face"
-        },
-        {
-            "wallet_address": "0x4567890123456789012345678901234567890123",
-            "username": "diana_investor",
-            "email": "diana@example.com",
-            "role": "investor",
-            "bio": "Early stage investor in creative projects",
-            "profile_image_url": "https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=150&h=150&fit=crop&crop=face"
-        }
-    ]
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return cache.stats()
 
-    for user_data in demo_users:
-        user = User(**user_data)
-        db.add(user)
+@app.get("/api/db/pool")
+async def db_pool_stats():
+    return {**pool_stats(), "routing": replica_router.stats()}
 
-    db.commit()
+@app.get("/api/tasks/stats")
+async def task_stats():
+    return await task_queue.stats()
 
-    # Get created users
-    creators = db.query(User).filter(User.role == "creator").all()
-    investors = db.query(User).filter(User.role == "investor").all()
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
-    # Create demo projects
-    demo_projects = [
-        {
-            "name": "Cyber Wolf NFT Collection",
-            "description": "A unique collection of AI-generated wolf NFTs with cyberpunk aesthetics",
-            "category": "art",
-            "target_revenue": 10000.0,
-            "current_revenue": 2500.0,
-            "nft_token_id": 1,
-            "nft_contract_address": "0x1234567890123456789012345678901234567890",
-            "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400&h=300&fit=crop",
-            "creator_id": creators[0].id
-        },
-        {
-            "name": "Neon Tiger Music Project",
-            "description": "Electronic music album with NFT ownership rights",
-            "category": "music",
-            "target_revenue": 5000.0,
-            "current_revenue": 1200.0,
-            "nft_token_id": 2,
-            "nft_contract_address": "0x1234567890123456789012345678901234567890",
-            "image_url": "https://images.unsplash.com/photo-1493225457124-a3eb161ffa5f?w=400&h=300&fit=crop",
-            "creator_id": creators[1].id
-        },
-        {
-            "name": "Tech Innovation Hub",
-            "description": "Revolutionary tech project with revenue sharing",
-            "category": "tech",
-            "target_revenue": 25000.0,
-            "current_revenue": 5000.0,
-            "nft_token_id": 3,
-            "nft_contract_address": "0x1234567890123456789012345678901234567890",
-            "image_url": "https://images.unsplash.com/photo-1518709268805-4e9042af2176?w=400&h=300&fit=crop",
-            "creator_id": creators[0].id
-        }
-    ]
-
-    for project_data in demo_projects:
-        project = Project(**project_data)
-        db.add(project)
-
-    db.commit()
-
-    # Get created projects
-    projects = db.query(Project).all()
-
-    # Create demo investments
-    demo_investments = [
-        {
-            "amount": 500.0,
-            "nft_token_id": 1,
-            "transaction_hash": f"0x{random.randint(100000, 999999)}",
-            "investor_id": investors[0].id,
-            "project_id": projects[0].id
-        },
-        {
-            "amount": 1000.0,
-            "nft_token_id": 1,
-            "transaction_hash": f"0x{random.randint(100000, 999999)}",
-            "investor_id": investors[1].id,
-            "project_id": projects[0].id
-        },
-        {
-            "amount": 300.0,
-            "nft_token_id": 2,
-            "transaction_hash": f"0x{random.randint(100000, 999999)}",
-            "investor_id": investors[0].id,
-            "project_id": projects[1].id
-        },
-        {
-            "amount": 2000.0,
-            "nft_token_id": 3,
-            "transaction_hash": f"0x{random.randint(100000, 999999)}",
-            "investor_id": investors[1].id,
-            "project_id": projects[2].id
-        }
-    ]
-
-    for investment_data in demo_investments:
-        investment = Investment(**investment_data)
-        db.add(investment)
-
-    db.commit()
-    db.close()
+@app.on_event("startup")
+async def startup_event():
+    """Start the task workers and log boot time; schema setup and demo data live in `python manage.py setup`"""
+    global boot_seconds
+    await task_queue.start()
+    boot_seconds = time.perf_counter() - import_started
+    logger.info("FlowMint API ready in %.0f ms", boot_seconds * 1000)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await task_queue.stop()
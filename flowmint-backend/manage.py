@@ -0,0 +1,68 @@
+"""Management commands, run once per deploy instead of on every worker boot.
+
+    python manage.py migrate             # alembic upgrade head
+    python manage.py seed                # demo users/projects/investments
+    python manage.py seed --synthetic --investments 1000000
+    python manage.py setup               # migrate, then seed the demo data
+    python manage.py reconcile           # fix running totals that drifted from the investments
+    python manage.py service-token       # bearer token for POST /api/investments/batch
+"""
+import argparse
+import asyncio
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="upgrade the schema to the latest migration")
+    seed = commands.add_parser("seed", help="load demo data, or a synthetic load-test dataset")
+    seed.add_argument("--synthetic", action="store_true", help="seed a generated dataset instead of the demo data")
+    seed.add_argument("--creators", type=int, default=200)
+    seed.add_argument("--investors", type=int, default=5000)
+    seed.add_argument("--projects", type=int, default=1000)
+    seed.add_argument("--investments", type=int, default=100000)
+    seed.add_argument("--seed", type=int, default=42)
+    commands.add_parser("setup", help="migrate, then seed the demo data")
+    commands.add_parser("reconcile", help="recompute project/user totals from the investments now")
+    token = commands.add_parser("service-token", help="print a bearer token for the backfill endpoints")
+    token.add_argument("--days", type=int, default=30, help="days until the token expires")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    from database import engine, run_migrations
+    from seeding import seed_demo, seed_synthetic
+
+    started = time.perf_counter()
+    if args.command in ("migrate", "setup"):
+        run_migrations()
+        print("schema is at the latest migration")
+    if args.command == "setup" or (args.command == "seed" and not args.synthetic):
+        print(f"demo data: {seed_demo(engine)} rows added")
+    if args.command == "seed" and args.synthetic:
+        seeded = seed_synthetic(engine, args.creators, args.investors, args.projects, args.investments, args.seed)
+        if seeded is None:
+            print("synthetic dataset already present, nothing to do")
+        else:
+            print(f"seeded {args.creators + args.investors} users, {args.projects} projects, {args.investments} investments")
+    if args.command == "reconcile":
+        asyncio.run(reconcile())
+    if args.command == "service-token":
+        from auth import create_access_token, SERVICE_ROLE
+        print(create_access_token(0, SERVICE_ROLE, expires_minutes=args.days * 24 * 60))
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+async def reconcile():
+    # Through the queue, so it is claimed and retried like the scheduled runs
+    from tasks import queue
+    task_id = await queue.enqueue_once("ledger.reconcile", {}, f"ledger.reconcile:manual:{time.time()}")
+    if not await queue.run(task_id):
+        raise SystemExit(f"reconciliation failed, see outbox task {task_id}")
+    print("running totals reconciled")
+
+
+if __name__ == "__main__":
+    main()
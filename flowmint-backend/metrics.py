@@ -0,0 +1,281 @@
+"""Request instrumentation exposed in the Prometheus text format at /metrics.
+
+``MetricsMiddleware`` records per-route latency, response size and the
+database work each request did: query count and time come from engine
+cursor events, and pool checkout time from ``TimedQueuePool``. Both are
+attributed to the request through a context variable, which SQLAlchemy's
+async greenlets share with the calling task.
+
+Setting ``PROFILE_TOKEN`` enables the sampling profiler: a request sent with
+``X-Profile: <token>`` has all thread stacks sampled while it runs, written
+to ``PROFILE_DIR`` as folded stacks (the input format of flamegraph.pl and
+speedscope).
+"""
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+METRICS_SLOW_QUERY_COUNT = int(os.environ.get("METRICS_SLOW_QUERY_COUNT", "25"))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "1"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+logger = logging.getLogger("flowmint.metrics")
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, (counts, total) in sorted(self._series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {cumulative}'
+            suffix = f"{{{labels}}}" if labels else ""
+            yield f"{self.name}_sum{suffix} {total}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class Gauge:
+    """Value read at scrape time from ``collect()``, which returns {label values: value}"""
+
+    def __init__(self, name: str, help: str, labels, collect):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for label_values, value in sorted(self.collect().items()):
+            labels = _labels(self.labels, label_values)
+            yield f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}"
+
+
+def _labels(names, values):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+request_duration = Histogram("flowmint_http_request_duration_seconds", "Request latency", ("method", "route", "status"))
+response_size = Histogram("flowmint_http_response_size_bytes", "Response body size", ("method", "route"), SIZE_BUCKETS)
+request_queries = Histogram("flowmint_http_request_db_queries", "Database queries per request", ("method", "route"), COUNT_BUCKETS)
+request_db_time = Histogram("flowmint_http_request_db_seconds", "Time spent in database queries per request", ("method", "route"))
+query_duration = Histogram("flowmint_db_query_duration_seconds", "Individual query latency")
+pool_wait = Histogram("flowmint_db_pool_checkout_seconds", "Time to check a connection out of the pool")
+
+registry = [request_duration, response_size, request_queries, request_db_time, query_duration, pool_wait]
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in registry for line in metric.render()) + "\n"
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "pool_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_seconds = 0.0
+
+
+current_request: ContextVar = ContextVar("flowmint_request_stats", default=None)
+
+
+# Database instrumentation
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    query_duration.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def instrument_engine(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool recording how long each checkout took, including waiting for a free slot"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            elapsed = time.perf_counter() - started
+            pool_wait.observe(elapsed)
+            stats = current_request.get()
+            if stats is not None:
+                stats.pool_seconds += elapsed
+
+
+# Sampling profiler
+class SamplingProfiler:
+    """Samples every thread's Python stack on a timer and aggregates folded stacks.
+
+    Stacks are rooted at the thread name, so event loop time and time in
+    driver threads (e.g. aiosqlite's worker) show up side by side. Other
+    requests running concurrently are sampled too.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="flowmint-profiler", daemon=True)
+
+    @classmethod
+    def try_start(cls, interval: float):
+        """Start a profiler unless another request is already being profiled"""
+        if not cls._lock.acquire(blocking=False):
+            return None
+        profiler = cls(interval)
+        profiler._thread.start()
+        return profiler
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(name.replace(";", ":") for name in reversed(stack))] += 1
+
+    def stop(self, path: str):
+        self._stop.set()
+        self._thread.join()
+        SamplingProfiler._lock.release()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _route_template(scope) -> str:
+    """Matched route template with its router prefix, e.g. ``/api/projects/{project_id}``"""
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    try:
+        rendered = path_format.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return path_format
+    path = scope["path"]
+    return path[:len(path) - len(rendered)] + path_format if path.endswith(rendered) else path_format
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses pass through untouched.
+
+    Adds a ``Server-Timing`` header with the request's query count and
+    database time, and logs requests issuing more than
+    METRICS_SLOW_QUERY_COUNT queries, which usually means an N+1 loop.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        profiler = profile_path = None
+        if PROFILE_TOKEN and dict(scope["headers"]).get(b"x-profile", b"").decode() == PROFILE_TOKEN:
+            profiler = SamplingProfiler.try_start(PROFILE_INTERVAL_MS / 1000)
+            if profiler:
+                profile_path = os.path.join(PROFILE_DIR, f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{scope['method']}.folded")
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                # Only the work done before the body starts is known here
+                timing = f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries", pool;dur={stats.pool_seconds * 1000:.2f}'
+                headers.append((b"server-timing", timing.encode()))
+                if profile_path:
+                    headers.append((b"x-profile-path", profile_path.encode()))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            if profiler:
+                profiler.stop(profile_path)
+            route = _route_template(scope)
+            method = scope["method"]
+            request_duration.observe(elapsed, method, route, str(status))
+            response_size.observe(size, method, route)
+            request_queries.observe(stats.queries, method, route)
+            request_db_time.observe(stats.db_seconds, method, route)
+            if stats.queries > METRICS_SLOW_QUERY_COUNT:
+                logger.warning("%s %s issued %d queries (%.1f ms in the database)", method, route, stats.queries, stats.db_seconds * 1000)
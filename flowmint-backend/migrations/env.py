@@ -0,0 +1,64 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import Base, DATABASE_URL, engine
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Search index objects from 0006 that database.py doesn't model: the SQLite
+# FTS5 table and its shadow tables (triggers aren't reflected), and the
+# Postgres generated column and its GIN index
+SEARCH_INDEX_COLUMNS = {("projects", "search_vector")}
+SEARCH_INDEX_INDEXES = {"ix_projects_search_vector"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate from proposing to drop the full-text search objects"""
+    if type_ == "table" and name.startswith("projects_fts"):
+        return False
+    if type_ == "column" and (object.table.name, name) in SEARCH_INDEX_COLUMNS:
+        return False
+    if type_ == "index" and name in SEARCH_INDEX_INDEXES:
+        return False
+    return True
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL to stdout without connecting."""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run migrations against the application's engine."""
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+            include_object=include_object,
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
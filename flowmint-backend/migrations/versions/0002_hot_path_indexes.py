@@ -0,0 +1,46 @@
+"""hot path indexes
+
+Covers the foreign-key filters used by the dashboards, project listing and
+project investments, plus (created_at, id) for cursor pagination. On
+Postgres the indexes are built CONCURRENTLY so live tables stay writable.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 20:44:32.393563
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_investments_project_id_created_at', 'investments', ['project_id', 'created_at']),
+    ('ix_investments_investor_id_created_at', 'investments', ['investor_id', 'created_at']),
+    ('ix_investments_created_at_id', 'investments', ['created_at', 'id']),
+    ('ix_projects_creator_id', 'projects', ['creator_id']),
+    ('ix_projects_is_active_category', 'projects', ['is_active', 'category']),
+    ('ix_projects_created_at_id', 'projects', ['created_at', 'id']),
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=concurrently)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,58 @@
+"""leaderboard
+
+Adds the investment_rollups table (backfilled with hourly project buckets
+from existing investments) and the indexes that let top-k rankings read
+the first k index entries.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 20:48:25.489924
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('investment_rollups',
+    sa.Column('entity_type', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('investment_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('entity_type', 'entity_id', 'granularity', 'bucket_start')
+    )
+    op.create_index('ix_investment_rollups_window', 'investment_rollups', ['entity_type', 'granularity', 'bucket_start'], unique=False)
+    op.create_index('ix_projects_is_active_current_revenue', 'projects', ['is_active', 'current_revenue'], unique=False)
+    op.create_index('ix_users_role_total_revenue', 'users', ['role', 'total_revenue'], unique=False)
+    op.create_index('ix_users_role_total_invested', 'users', ['role', 'total_invested'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        hour = "date_trunc('hour', created_at)"
+    else:
+        hour = "strftime('%Y-%m-%d %H:00:00.000000', created_at)"
+    op.execute(
+        "INSERT INTO investment_rollups (entity_type, entity_id, granularity, bucket_start, amount, investment_count) "
+        f"SELECT 'project', project_id, 'hour', {hour}, SUM(amount), COUNT(*) FROM investments "
+        f"WHERE project_id IS NOT NULL AND created_at IS NOT NULL GROUP BY project_id, {hour}"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_role_total_invested', table_name='users')
+    op.drop_index('ix_users_role_total_revenue', table_name='users')
+    op.drop_index('ix_projects_is_active_current_revenue', table_name='projects')
+    op.drop_index('ix_investment_rollups_window', table_name='investment_rollups')
+    op.drop_table('investment_rollups')
@@ -0,0 +1,49 @@
+"""revenue payouts
+
+Per-investor payout rows written by the distribution engine, indexed for
+the investor dashboard's recent revenue.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 20:51:29.981858
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('revenue_payouts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('distribution_id', sa.Integer(), nullable=False),
+    sa.Column('investor_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('share', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['distribution_id'], ['revenue_distributions.id'], ),
+    sa.ForeignKeyConstraint(['investor_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_revenue_payouts_distribution_id', 'revenue_payouts', ['distribution_id'], unique=False)
+    op.create_index('ix_revenue_payouts_investor_id_created_at', 'revenue_payouts', ['investor_id', 'created_at'], unique=False)
+    op.create_index('ix_revenue_distributions_project_id_created_at', 'revenue_distributions', ['project_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_revenue_distributions_project_id_created_at', table_name='revenue_distributions')
+    op.drop_index('ix_revenue_payouts_investor_id_created_at', table_name='revenue_payouts')
+    op.drop_index('ix_revenue_payouts_distribution_id', table_name='revenue_payouts')
+    op.drop_table('revenue_payouts')
@@ -0,0 +1,54 @@
+"""rollup entities
+
+Backfills investment_rollups for creators and investors and adds daily
+buckets; 0003 only stored hourly project buckets.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 20:55:02.114325
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _truncate(granularity):
+    if op.get_bind().dialect.name == 'postgresql':
+        return f"date_trunc('{granularity}', i.created_at)"
+    if granularity == 'day':
+        return "strftime('%Y-%m-%d 00:00:00.000000', i.created_at)"
+    return "strftime('%Y-%m-%d %H:00:00.000000', i.created_at)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DELETE FROM investment_rollups")
+    sources = {
+        'project': ('i.project_id', ''),
+        'investor': ('i.investor_id', ''),
+        'creator': ('p.creator_id', 'JOIN projects p ON p.id = i.project_id'),
+    }
+    for entity_type, (entity_column, join) in sources.items():
+        for granularity in ('hour', 'day'):
+            bucket = _truncate(granularity)
+            op.execute(
+                "INSERT INTO investment_rollups (entity_type, entity_id, granularity, bucket_start, amount, investment_count) "
+                f"SELECT '{entity_type}', {entity_column}, '{granularity}', {bucket}, SUM(i.amount), COUNT(i.id) "
+                f"FROM investments i {join} "
+                f"WHERE {entity_column} IS NOT NULL AND i.created_at IS NOT NULL "
+                f"GROUP BY {entity_column}, {bucket}"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM investment_rollups WHERE entity_type != 'project' OR granularity != 'hour'")
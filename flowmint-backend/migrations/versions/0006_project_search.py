@@ -0,0 +1,71 @@
+"""project search
+
+Full-text index over project name and description. SQLite gets an external
+content FTS5 table kept in sync by triggers; Postgres gets a generated,
+weighted tsvector column with a GIN index. Either way the database keeps
+the index current on every insert/update, with no application code.
+
+Also widens (is_active, category) with (created_at, id) so browsing a
+category newest-first reads the index in order instead of sorting.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 21:02:41.530214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE projects_fts USING fts5("
+    "name, description, content='projects', content_rowid='id', tokenize='porter unicode61')",
+    # Only name/description changes touch the index, not the counter bumps on every investment
+    "CREATE TRIGGER projects_fts_ai AFTER INSERT ON projects BEGIN "
+    "INSERT INTO projects_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER projects_fts_ad AFTER DELETE ON projects BEGIN "
+    "INSERT INTO projects_fts(projects_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER projects_fts_au AFTER UPDATE OF name, description ON projects BEGIN "
+    "INSERT INTO projects_fts(projects_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO projects_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "INSERT INTO projects_fts(projects_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_projects_is_active_category_created_at', 'projects', ['is_active', 'category', 'created_at', 'id'], unique=False)
+    op.drop_index('ix_projects_is_active_category', table_name='projects')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "ALTER TABLE projects ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED"
+        )
+        with op.get_context().autocommit_block():
+            op.create_index('ix_projects_search_vector', 'projects', ['search_vector'], unique=False,
+                            postgresql_using='gin', postgresql_concurrently=True)
+        return
+    for statement in SQLITE_UPGRADE:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_projects_search_vector', table_name='projects')
+        op.drop_column('projects', 'search_vector')
+    else:
+        for trigger in ('projects_fts_au', 'projects_fts_ad', 'projects_fts_ai'):
+            op.execute(f"DROP TRIGGER {trigger}")
+        op.execute("DROP TABLE projects_fts")
+    op.create_index('ix_projects_is_active_category', 'projects', ['is_active', 'category'], unique=False)
+    op.drop_index('ix_projects_is_active_category_created_at', table_name='projects')
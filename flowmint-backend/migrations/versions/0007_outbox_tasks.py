@@ -0,0 +1,52 @@
+"""outbox tasks
+
+Durable queue of post-commit side effects (tasks.py). Investments created
+through the API are inserted with counters_applied = false and picked up by
+an investment.created task; existing rows and bulk-ingested ones count as
+applied.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 21:38:12.604417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('outbox_tasks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('dedupe_key', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('dedupe_key')
+    )
+    op.create_index('ix_outbox_tasks_status_run_after', 'outbox_tasks', ['status', 'run_after'], unique=False)
+    op.add_column('investments', sa.Column('counters_applied', sa.Boolean(), server_default=sa.true(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('investments') as batch_op:
+        batch_op.drop_column('counters_applied')
+    op.drop_index('ix_outbox_tasks_status_run_after', table_name='outbox_tasks')
+    op.drop_table('outbox_tasks')
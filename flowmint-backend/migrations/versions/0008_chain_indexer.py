@@ -0,0 +1,64 @@
+"""chain indexer
+
+Checkpoint and journal tables for indexer.py, which fills investments and
+revenue distributions from FlowMintNFT/RevenueDistributor logs. Projects
+get the address of their RevenueDistributor contract.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 22:04:51.118230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('indexed_blocks',
+    sa.Column('block_number', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('block_hash', sa.String(), nullable=False),
+    sa.Column('indexed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('block_number')
+    )
+    op.create_table('chain_logs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('block_number', sa.Integer(), nullable=False),
+    sa.Column('transaction_hash', sa.String(), nullable=False),
+    sa.Column('log_index', sa.Integer(), nullable=False),
+    sa.Column('event', sa.String(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('token_id', sa.Integer(), nullable=True),
+    sa.Column('from_user_id', sa.Integer(), nullable=True),
+    sa.Column('to_user_id', sa.Integer(), nullable=True),
+    sa.Column('investment_id', sa.Integer(), nullable=True),
+    sa.Column('distribution_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['distribution_id'], ['revenue_distributions.id'], ),
+    sa.ForeignKeyConstraint(['from_user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['investment_id'], ['investments.id'], ),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.ForeignKeyConstraint(['to_user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('transaction_hash', 'log_index')
+    )
+    op.create_index(op.f('ix_chain_logs_block_number'), 'chain_logs', ['block_number'], unique=False)
+    op.add_column('projects', sa.Column('distributor_address', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # A plain DROP COLUMN: a batch table copy would lose the projects_fts triggers
+    op.drop_column('projects', 'distributor_address')
+    op.drop_index(op.f('ix_chain_logs_block_number'), table_name='chain_logs')
+    op.drop_table('chain_logs')
+    op.drop_table('indexed_blocks')
@@ -0,0 +1,34 @@
+"""lowercase wallets
+
+Wallet addresses are stored lowercase so lookups (including the chain
+indexer's, whose log topics are lowercase) can compare them directly and use
+ix_users_wallet_address. Fails if two users' addresses differ only in case;
+merge those first.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 09:12:37.604211
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("UPDATE users SET wallet_address = lower(wallet_address) WHERE wallet_address != lower(wallet_address)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The original casing is gone; lowercase addresses are still valid
+    pass
@@ -0,0 +1,98 @@
+"""collection versions
+
+One row per listed collection whose version the database bumps, by trigger,
+in the same transaction as every insert/update/delete of its rows. List
+ETags are built from it, so every worker sees the same version without a
+shared cache, and a replica's version always matches the rows it returns.
+
+SQLite bumps per row. Postgres bumps the collection once per statement, and
+the per-project investments lists per row.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 10:41:08.263517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('projects', 'users', 'investments')
+EVENTS = {'ai': 'INSERT', 'au': 'UPDATE', 'ad': 'DELETE'}
+
+
+def _bump(name: str) -> str:
+    return (
+        f"INSERT INTO collection_versions (name, version) VALUES ({name}, 1) "
+        "ON CONFLICT (name) DO UPDATE SET version = collection_versions.version + 1;"
+    )
+
+
+def _project_investments(row: str) -> str:
+    return f"'investments:' || {row}.project_id"
+
+
+def _sqlite_triggers():
+    for table in TABLES:
+        for suffix, event in EVENTS.items():
+            names = [f"'{table}'"]
+            if table == 'investments':
+                rows = {'ai': ['new'], 'au': ['old', 'new'], 'ad': ['old']}[suffix]
+                names += [_project_investments(row) for row in rows]
+            body = " ".join(_bump(name) for name in names)
+            yield f"CREATE TRIGGER {table}_version_{suffix} AFTER {event} ON {table} BEGIN {body} END"
+
+
+POSTGRES_UPGRADE = [
+    "CREATE FUNCTION bump_collection_version() RETURNS trigger LANGUAGE plpgsql AS $$ "
+    f"BEGIN {_bump('TG_ARGV[0]')} RETURN NULL; END $$",
+    "CREATE FUNCTION bump_project_investments_version() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    f"IF TG_OP <> 'INSERT' THEN {_bump(_project_investments('OLD'))} END IF; "
+    f"IF TG_OP <> 'DELETE' THEN {_bump(_project_investments('NEW'))} END IF; "
+    "RETURN NULL; END $$",
+    *(
+        f"CREATE TRIGGER {table}_version AFTER INSERT OR UPDATE OR DELETE ON {table} "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION bump_collection_version('{table}')"
+        for table in TABLES
+    ),
+    "CREATE TRIGGER investments_project_version AFTER INSERT OR UPDATE OR DELETE ON investments "
+    "FOR EACH ROW EXECUTE FUNCTION bump_project_investments_version()",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('collection_versions',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        statements = POSTGRES_UPGRADE
+    else:
+        statements = list(_sqlite_triggers())
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TABLES:
+            op.execute(f"DROP TRIGGER {table}_version ON {table}")
+        op.execute("DROP TRIGGER investments_project_version ON investments")
+        op.execute("DROP FUNCTION bump_project_investments_version()")
+        op.execute("DROP FUNCTION bump_collection_version()")
+    else:
+        for table in TABLES:
+            for suffix in EVENTS:
+                op.execute(f"DROP TRIGGER {table}_version_{suffix}")
+    op.drop_table('collection_versions')
@@ -1,10 +1,13 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import AfterValidator, BaseModel, EmailStr, Field
+from typing import Annotated, Optional, List, Literal
 from datetime import datetime
 
+# Stored and compared lowercase, as the chain indexer records them
+WalletAddress = Annotated[str, AfterValidator(str.lower)]
+
 # User Models
 class UserBase(BaseModel):
-    wallet_address: str
+    wallet_address: WalletAddress
     username: Optional[str] = None
     email: Optional[EmailStr] = None
     role: str
@@ -12,7 +15,7 @@ class UserBase(BaseModel):
     profile_image_url: Optional[str] = None
 
 class UserCreate(UserBase):
-    pass
+    role: Literal["creator", "investor"]
 
 class UserUpdate(BaseModel):
     username: Optional[str] = None
@@ -49,12 +52,16 @@ class ProjectUpdate(BaseModel):
     target_revenue: Optional[float] = None
     image_url: Optional[str] = None
     is_active: Optional[bool] = None
+    # Deployed contracts, watched by the chain indexer
+    nft_contract_address: Optional[str] = None
+    distributor_address: Optional[str] = None
 
 class ProjectResponse(ProjectBase):
     id: int
     current_revenue: float
     nft_token_id: Optional[int]
     nft_contract_address: Optional[str]
+    distributor_address: Optional[str] = None
     is_active: bool
     created_at: datetime
     updated_at: datetime
@@ -81,6 +88,96 @@ class InvestmentResponse(InvestmentBase):
     class Config:
         from_attributes = True
 
+# Revenue Distribution Models
+class RevenueDistributionCreate(BaseModel):
+    amount: float = Field(gt=0)
+    distribution_percentage: float = Field(gt=0, le=100)
+    transaction_hash: Optional[str] = None
+
+class RevenueDistributionResponse(RevenueDistributionCreate):
+    amount: float
+    distribution_percentage: float
+    id: int
+    project_id: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class RevenuePayoutResponse(BaseModel):
+    distribution_id: int
+    investor_id: int
+    project_id: int
+    amount: float
+    share: float
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+# Bulk Ingestion Models
+class InvestmentBatchItem(InvestmentCreate):
+    investor_id: int
+
+class InvestmentBatchRowError(BaseModel):
+    index: int
+    transaction_hash: Optional[str] = None
+    detail: str
+
+class InvestmentBatchResult(BaseModel):
+    inserted: int = 0
+    duplicates: List[InvestmentBatchRowError] = []
+    errors: List[InvestmentBatchRowError] = []
+
+# Cursor Pagination Models
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+class ProjectPage(BaseModel):
+    items: List[ProjectResponse]
+    next_cursor: Optional[str] = None
+
+class InvestmentPage(BaseModel):
+    items: List[InvestmentResponse]
+    next_cursor: Optional[str] = None
+
+# Search Models
+class CategoryFacet(BaseModel):
+    category: Optional[str]
+    count: int
+
+class ProjectSearchResult(BaseModel):
+    items: List[ProjectResponse]
+    total: int
+    facets: List[CategoryFacet]
+
+# Batch Lookup Models
+class ProjectInvestmentCount(BaseModel):
+    project_id: int
+    investment_count: int
+
+# Leaderboard Models
+class TrendingProject(BaseModel):
+    project: ProjectResponse
+    window_amount: float
+    window_investments: int
+
+# Time Series Models
+class RollupPoint(BaseModel):
+    bucket_start: datetime
+    amount: float
+    investment_count: int
+    
+    class Config:
+        from_attributes = True
+
+class RollupSeries(BaseModel):
+    entity_type: str
+    entity_id: int
+    granularity: str
+    points: List[RollupPoint]
+
 # Dashboard Models
 class CreatorDashboard(BaseModel):
     user: UserResponse
@@ -94,11 +191,12 @@ class InvestorDashboard(BaseModel):
     investments: List[InvestmentResponse]
     total_invested: float
     total_projects: int
-    recent_revenue: List[dict]
+    total_investments: int
+    recent_revenue: List[RevenuePayoutResponse]
 
 # Auth Models
 class LoginRequest(BaseModel):
-    wallet_address: str
+    wallet_address: WalletAddress
     signature: Optional[str] = None
 
 class AuthResponse(BaseModel):
@@ -0,0 +1,44 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode a (created_at, id) position as an opaque URL-safe token"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+async def keyset_page(db: AsyncSession, query, model, after: Optional[str], limit: int):
+    """Fetch one page ordered by (created_at, id) starting after the given cursor.
+
+    ``query`` selects columns of ``model`` including ``created_at`` and ``id``.
+    Returns the rows and the cursor for the next page (None on the last page).
+    An empty ``after`` starts from the beginning.
+    """
+    limit = max(limit, 1)
+    if after:
+        created_at, row_id = decode_cursor(after)
+        query = query.where(tuple_(model.created_at, model.id) > tuple_(created_at, row_id))
+
+    query = query.order_by(model.created_at, model.id).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,192 @@
+"""Token-bucket rate limiting for the write endpoints bots tend to hammer.
+
+``RateLimitMiddleware`` runs before routing, so a throttled request is
+answered with a 429 without touching the database pool. Clients are told
+apart by the user id in their bearer token (checked through the auth cache)
+and otherwise by IP address. Buckets are kept per worker, or in Redis with
+``RATE_LIMIT_BACKEND=redis`` so the limits hold across workers.
+"""
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import NamedTuple
+from fastapi import HTTPException
+from auth import authenticate
+from cache import CACHE_URL
+
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")  # "memory", "redis" or "none"
+RATE_LIMIT_URL = os.environ.get("RATE_LIMIT_URL", CACHE_URL)
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+# Only enable behind a proxy that overwrites X-Forwarded-For, or clients can pick their own key
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+
+logger = logging.getLogger("flowmint.ratelimit")
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+class Limit(NamedTuple):
+    """Bucket of ``capacity`` requests refilled at ``rate`` per second"""
+    capacity: float
+    rate: float
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        """``"120/minute"`` allows bursts of 120 and refills to that over a minute"""
+        count, _, period = spec.partition("/")
+        try:
+            count = float(count)
+        except ValueError:
+            count = math.nan
+        # A count of 0 would divide by zero in take(), and the middleware would then let everything through
+        if period not in PERIODS or not 0 < count < math.inf:
+            raise ValueError(f"Rate limit {spec!r} must look like '<count>/second|minute|hour' with a count above 0")
+        return cls(count, count / PERIODS[period])
+
+
+RATE_LIMITS = {
+    ("POST", "/api/investments"): Limit.parse(os.environ.get("RATE_LIMIT_INVESTMENTS", "120/minute")),
+    ("POST", "/api/register"): Limit.parse(os.environ.get("RATE_LIMIT_REGISTER", "10/minute")),
+    ("POST", "/api/login"): Limit.parse(os.environ.get("RATE_LIMIT_LOGIN", "30/minute")),
+    ("POST", "/api/investments/batch"): Limit.parse(os.environ.get("RATE_LIMIT_BACKFILL", "60/minute")),
+    ("POST", "/api/investments/batch/ndjson"): Limit.parse(os.environ.get("RATE_LIMIT_BACKFILL", "60/minute")),
+}
+
+
+class MemoryBuckets:
+    """Buckets in this process; the least recently used are dropped past ``max_keys``"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, limit: Limit) -> float:
+        """Take a token; returns 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / limit.rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def stats(self):
+        return {"backend": "memory", "keys": len(self._buckets)}
+
+
+# Same arithmetic as MemoryBuckets, run atomically inside Redis
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(retry_after)
+"""
+
+
+class RedisBuckets:
+    """Buckets shared by all workers.
+
+    ``client`` is anything exposing the async ``eval`` of ``redis.asyncio.Redis``.
+    Timestamps come from the workers' clocks, so keep them in sync.
+    """
+
+    def __init__(self, client, prefix: str = "flowmint:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, limit: Limit) -> float:
+        result = await self.client.eval(TAKE_SCRIPT, 1, self.prefix + key, limit.capacity, limit.rate, time.time())
+        return float(result)
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+def create_buckets():
+    if RATE_LIMIT_BACKEND == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        return RedisBuckets(redis.from_url(RATE_LIMIT_URL))
+    if RATE_LIMIT_BACKEND == "none":
+        return None
+    return MemoryBuckets()
+
+
+buckets = create_buckets()
+rejected = Counter()
+
+
+def client_key(scope) -> str:
+    """``user:<id>`` for a valid bearer token, else ``ip:<address>``"""
+    headers = dict(scope["headers"])
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{authenticate(token).id}"
+        except HTTPException:
+            pass
+    forwarded = headers.get(b"x-forwarded-for") if RATE_LIMIT_TRUST_FORWARDED else None
+    if forwarded:
+        return f"ip:{forwarded.decode('latin-1').split(',')[0].strip()}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware applying ``RATE_LIMITS`` by method and exact path"""
+
+    def __init__(self, app, limits=RATE_LIMITS):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if limit is None or buckets is None:
+            return await self.app(scope, receive, send)
+
+        route = f"{scope['method']} {scope['path']}"
+        try:
+            retry_after = await buckets.take(f"{route}:{client_key(scope)}", limit)
+        except Exception:
+            # A broken shared backend shouldn't take the write path down with it
+            logger.exception("Rate limit backend failed; letting the request through")
+            retry_after = 0.0
+        if retry_after <= 0:
+            return await self.app(scope, receive, send)
+
+        rejected[route] += 1
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,185 @@
+"""Routing of read-only requests to the read replicas in DATABASE_REPLICA_URLS.
+
+``get_read_db`` is the ``get_db`` for GET handlers: it hands out a session on
+the next healthy replica, round-robin, and falls back to the primary when
+none is reachable. A replica that fails to connect is skipped for
+REPLICA_RETRY_SECONDS.
+
+Replicas lag the primary, so a client that has just written reads from the
+primary for REPLICA_STICKY_SECONDS afterwards. ``ReadYourWritesMiddleware``
+records successful writes in a cookie, which works across workers, and by
+the bearer token's user in this worker.
+"""
+import itertools
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from fastapi import HTTPException, Request
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from auth import authenticate
+from database import AsyncSessionLocal, async_engine, replica_engines
+
+REPLICA_STICKY_SECONDS = float(os.environ.get("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_RETRY_SECONDS = float(os.environ.get("REPLICA_RETRY_SECONDS", "30"))
+STICKY_COOKIE = "flowmint_primary_until"
+
+logger = logging.getLogger("flowmint.replicas")
+
+
+class StickyUsers:
+    """User id -> time until which their reads go to the primary.
+
+    Every entry lives for the same window, so insertion order is expiry
+    order and expired entries are trimmed from the front.
+    """
+
+    def __init__(self, window: float = REPLICA_STICKY_SECONDS):
+        self.window = window
+        self._until = OrderedDict()
+
+    def mark(self, user_id: int):
+        now = time.time()
+        self._until.pop(user_id, None)
+        self._until[user_id] = now + self.window
+        while self._until:
+            oldest, until = next(iter(self._until.items()))
+            if until > now:
+                break
+            del self._until[oldest]
+
+    def __contains__(self, user_id: int) -> bool:
+        return self._until.get(user_id, 0) > time.time()
+
+
+sticky_users = StickyUsers()
+
+
+def _bearer_user(authorization: str):
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return authenticate(token).id
+    except HTTPException:
+        return None
+
+
+def wants_primary(request: Request) -> bool:
+    """Whether this client wrote recently enough that a replica may not have its write yet"""
+    try:
+        if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    user_id = _bearer_user(request.headers.get("authorization", ""))
+    return user_id is not None and user_id in sticky_users
+
+
+class ReplicaRouter:
+    def __init__(self, engines):
+        self.engines = engines
+        self.sessions = [
+            async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            for engine in engines
+        ]
+        self.reads = Counter()
+        self._turn = itertools.count()
+        self._down_until = [0.0] * len(engines)
+
+    def _candidates(self):
+        """Replica indexes in round-robin order, skipping ones marked down"""
+        start = next(self._turn)
+        now = time.monotonic()
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self._down_until[index] <= now:
+                yield index
+
+    def _mark_down(self, index: int, exc: Exception):
+        self._down_until[index] = time.monotonic() + REPLICA_RETRY_SECONDS
+        logger.warning("Read replica %d unavailable, using the primary for %.0fs: %s", index, REPLICA_RETRY_SECONDS, exc)
+
+    async def session(self, request: Request) -> AsyncSession:
+        if not self.engines:
+            return AsyncSessionLocal()
+        if wants_primary(request):
+            self.reads["sticky"] += 1
+            return AsyncSessionLocal()
+        for index in self._candidates():
+            db = self.sessions[index]()
+            try:
+                # Connect now, so an unreachable replica falls back before the handler runs
+                await db.connection()
+            except (DBAPIError, OSError) as exc:
+                await db.close()
+                self._mark_down(index, exc)
+                continue
+            self.reads["replica"] += 1
+            return db
+        self.reads["fallback"] += 1
+        return AsyncSessionLocal()
+
+    async def engine(self, request: Request):
+        """Engine for reads outside a session (e.g. streamed exports), picked as ``session`` picks one"""
+        if not self.engines:
+            return async_engine
+        if wants_primary(request):
+            self.reads["sticky"] += 1
+            return async_engine
+        for index in self._candidates():
+            try:
+                # The checked connection goes back to the pool for the export to reuse
+                async with self.engines[index].connect():
+                    pass
+            except (DBAPIError, OSError) as exc:
+                self._mark_down(index, exc)
+                continue
+            self.reads["replica"] += 1
+            return self.engines[index]
+        self.reads["fallback"] += 1
+        return async_engine
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "replicas": len(self.engines),
+            "down": [index for index, until in enumerate(self._down_until) if until > now],
+            "reads": dict(self.reads),
+        }
+
+
+router = ReplicaRouter(replica_engines)
+
+
+# Database dependency for read-only handlers
+async def get_read_db(request: Request):
+    async with await router.session(request) as db:
+        yield db
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary for REPLICA_STICKY_SECONDS after a successful write"""
+
+    WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.WRITE_METHODS or not router.engines:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + REPLICA_STICKY_SECONDS
+                cookie = f"{STICKY_COOKIE}={until:.3f}; Max-Age={int(REPLICA_STICKY_SECONDS) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]}
+                authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+                user_id = _bearer_user(authorization)
+                if user_id is not None:
+                    sticky_users.mark(user_id)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
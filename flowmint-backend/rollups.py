@@ -0,0 +1,105 @@
+"""Pre-aggregated investment time series.
+
+``investment_rollups`` holds the invested amount and investment count per
+project, creator and investor in hourly and daily buckets. Investment writes
+bump the current buckets in the same transaction (see
+``ledger.apply_investment_deltas``); ``rebuild_rollups`` recomputes everything
+from the raw ``investments`` table:
+
+    python rollups.py rebuild
+"""
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Investment, InvestmentRollup, Project
+
+ENTITY_TYPES = ("project", "creator", "investor")
+GRANULARITIES = ("hour", "day")
+UPSERT_CHUNK_SIZE = 1000
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_increments(deltas, timestamp: datetime):
+    """Turn ``(project_id, investor_id, creator_id, amount)`` deltas into bucket increments"""
+    buckets = defaultdict(lambda: [0.0, 0])
+    for project_id, investor_id, creator_id, amount in deltas:
+        for entity_type, entity_id in (("project", project_id), ("investor", investor_id), ("creator", creator_id)):
+            if entity_id is None:
+                continue
+            for granularity in GRANULARITIES:
+                bucket = buckets[(entity_type, entity_id, granularity, bucket_start(timestamp, granularity))]
+                bucket[0] += amount
+                # A negative delta takes an investment back out (chain reorgs)
+                bucket[1] += 1 if amount >= 0 else -1
+    return [key + tuple(value) for key, value in buckets.items()]
+
+
+async def bump_rollups(db: AsyncSession, buckets):
+    """Upsert ``(entity_type, entity_id, granularity, bucket_start, amount, count)`` increments"""
+    rows = [
+        dict(entity_type=entity_type, entity_id=entity_id, granularity=granularity, bucket_start=bucket_start, amount=amount, investment_count=count)
+        for entity_type, entity_id, granularity, bucket_start, amount, count in sorted(buckets)
+    ]
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    # Multi-row VALUES; chunked to stay under SQLite's bind parameter limit
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = dialect.insert(InvestmentRollup).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["entity_type", "entity_id", "granularity", "bucket_start"],
+            set_={
+                "amount": InvestmentRollup.amount + stmt.excluded.amount,
+                "investment_count": InvestmentRollup.investment_count + stmt.excluded.investment_count,
+            },
+        ))
+
+
+def _truncate(connection, granularity: str):
+    if connection.dialect.name == "postgresql":
+        return func.date_trunc(granularity, Investment.created_at)
+    fmt = "%Y-%m-%d 00:00:00.000000" if granularity == "day" else "%Y-%m-%d %H:00:00.000000"
+    return func.strftime(fmt, Investment.created_at)
+
+
+def rebuild_rollups(connection):
+    """Recompute every rollup bucket from the investments table.
+
+    Takes a sync Connection inside a transaction; from async code use
+    ``await conn.run_sync(rebuild_rollups)``. Run it while investment writes
+    are paused, or buckets touched during the rebuild may be counted twice.
+    """
+    connection.execute(delete(InvestmentRollup))
+    columns = ["entity_type", "entity_id", "granularity", "bucket_start", "amount", "investment_count"]
+    sources = {
+        "project": (Investment.project_id, None),
+        "investor": (Investment.investor_id, None),
+        "creator": (Project.creator_id, Project),
+    }
+    for entity_type, (entity_column, join) in sources.items():
+        for granularity in GRANULARITIES:
+            bucket = _truncate(connection, granularity)
+            query = select(
+                literal(entity_type), entity_column, literal(granularity), bucket,
+                func.sum(Investment.amount), func.count(Investment.id),
+            )
+            if join is not None:
+                query = query.select_from(Investment).join(join, Project.id == Investment.project_id)
+            query = query.where(entity_column.is_not(None), Investment.created_at.is_not(None)).group_by(entity_column, bucket)
+            connection.execute(insert(InvestmentRollup).from_select(columns, query))
+
+
+if __name__ == "__main__":
+    import sys
+    from database import engine
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python rollups.py rebuild")
+    with engine.begin() as connection:
+        rebuild_rollups(connection)
+    print("rollups rebuilt")
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from events import broker, format_sse, EVENT_HEARTBEAT_SECONDS
+from typing import List
+import asyncio
+
+router = APIRouter(prefix="/events")
+
+@router.get("")
+async def stream_events(request: Request, project: List[int] = Query([]), user: List[int] = Query([])):
+    """Server-sent events for the given projects and users.
+
+    Emits ``investment.created``, ``project.updated``, ``project.deactivated``
+    and ``distribution.created`` as they happen, plus ``resync`` when this
+    client fell behind and some events were dropped.
+    """
+    topics = [f"project:{project_id}" for project_id in project] + [f"user:{user_id}" for user_id in user]
+    if not topics:
+        raise HTTPException(status_code=400, detail="Subscribe to at least one project or user")
+    subscription = broker.subscribe(topics)
+    
+    async def stream():
+        try:
+            yield format_sse("subscribed", {"topics": sorted(subscription.topics)})
+            while True:
+                try:
+                    event = await subscription.get(EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.lagged:
+                    subscription.lagged = False
+                    yield format_sse("resync", {"reason": "events dropped, re-fetch current state"})
+                yield format_sse(event["type"], event["data"])
+        finally:
+            subscription.close()
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/stats")
+async def event_stats():
+    return broker.stats()
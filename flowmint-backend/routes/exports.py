@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from export import export_rows, investments_query, projects_query, MEDIA_TYPES
+from replicas import router as replica_router
+from datetime import datetime
+from typing import Optional
+
+router = APIRouter(prefix="/export")
+
+FORMAT = Query("ndjson", pattern="^(ndjson|csv)$")
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip: listed, or covered by ``*``, with q > 0"""
+    weights = {}
+    for entry in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in entry.split(";")]
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
+
+async def _export_response(request: Request, query, fmt: str, name: str):
+    """Stream ``query`` as an attachment, gzipped when the client accepts it"""
+    compress = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}.{fmt}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export_rows(query, fmt, compress, await replica_router.engine(request)), media_type=MEDIA_TYPES[fmt], headers=headers)
+
+@router.get("/investments")
+async def export_investments(
+    request: Request,
+    format: str = FORMAT,
+    project_id: Optional[int] = None,
+    investor_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """Every matching investment, oldest first; ``start`` is inclusive and ``end`` exclusive"""
+    return await _export_response(request, investments_query(project_id, investor_id, start, end), format, "investments")
+
+@router.get("/projects")
+async def export_projects(
+    request: Request,
+    format: str = FORMAT,
+    category: Optional[str] = None,
+    creator_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """Every matching project, active or not, oldest first"""
+    return await _export_response(request, projects_query(category, creator_id, start, end), format, "projects")
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Project, User, InvestmentRollup
+from replicas import get_read_db
+from models import ProjectResponse, UserResponse, TrendingProject
+from typing import List
+from datetime import datetime, timedelta
+
+router = APIRouter(prefix="/leaderboard")
+
+# Rankings read the running totals kept by ledger.apply_investment_deltas through
+# (filter, total) indexes, so each query touches only the top `limit` rows.
+
+@router.get("/projects", response_model=List[ProjectResponse])
+async def top_projects(limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_db)):
+    projects = (await db.scalars(
+        select(Project).where(Project.is_active == True).order_by(Project.current_revenue.desc()).limit(limit)
+    )).all()
+    return [ProjectResponse.from_orm(project) for project in projects]
+
+@router.get("/creators", response_model=List[UserResponse])
+async def top_creators(limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_db)):
+    users = (await db.scalars(
+        select(User).where(User.role == "creator").order_by(User.total_revenue.desc()).limit(limit)
+    )).all()
+    return [UserResponse.from_orm(user) for user in users]
+
+@router.get("/investors", response_model=List[UserResponse])
+async def top_investors(limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_db)):
+    users = (await db.scalars(
+        select(User).where(User.role == "investor").order_by(User.total_invested.desc()).limit(limit)
+    )).all()
+    return [UserResponse.from_orm(user) for user in users]
+
+@router.get("/trending", response_model=List[TrendingProject])
+async def trending_projects(
+    window_hours: int = Query(24, ge=1, le=24 * 30),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Active projects ranked by amount invested over the last ``window_hours``.
+
+    Sums the hourly project rollups, so the cost depends on the number of
+    buckets in the window rather than on the size of the investments table.
+    """
+    since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=window_hours - 1)
+    window = (
+        select(
+            InvestmentRollup.entity_id.label("project_id"),
+            func.sum(InvestmentRollup.amount).label("amount"),
+            func.sum(InvestmentRollup.investment_count).label("investments"),
+        )
+        .where(
+            InvestmentRollup.entity_type == "project",
+            InvestmentRollup.granularity == "hour",
+            InvestmentRollup.bucket_start >= since,
+        )
+        .group_by(InvestmentRollup.entity_id)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(Project, window.c.amount, window.c.investments)
+        .join(window, window.c.project_id == Project.id)
+        .where(Project.is_active == True)
+        .order_by(window.c.amount.desc(), Project.id)
+        .limit(limit)
+    )).all()
+    return [
+        TrendingProject(project=ProjectResponse.from_orm(project), window_amount=amount, window_investments=investments)
+        for project, amount, investments in rows
+    ]
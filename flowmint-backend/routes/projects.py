@@ -1,18 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db, Project, User, Investment
-from models import ProjectCreate, ProjectResponse, ProjectUpdate, InvestmentCreate, InvestmentResponse
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import ValidationError
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, Project, User, Investment, RevenueDistribution
+from replicas import get_read_db
+from ledger import ingest_investments, INGEST_CHUNK_SIZE
+from tasks import enqueue, queue as task_queue
+from distribution import distribute_revenue
+from search import search_projects
+from events import publish_investment, publish_project, publish_distribution
+from cache import get_cached_project, invalidate_projects
+from models import ProjectCreate, ProjectResponse, ProjectUpdate, InvestmentCreate, InvestmentResponse, ProjectPage, InvestmentPage, InvestmentBatchItem, InvestmentBatchResult, InvestmentBatchRowError, RevenueDistributionCreate, RevenueDistributionResponse, ProjectSearchResult, ProjectInvestmentCount
+from pagination import keyset_page
+from serialization import columns_for, list_response, model_response, sparse_model, page_model
+from http_cache import cache_headers, conditional_collection, conditional_entity
+from auth import Principal, ensure_user, get_principal, require_role, SERVICE_ROLE
+from typing import List, Optional, Union
 from datetime import datetime
 
 router = APIRouter()
 
+MAX_BATCH_IDS = 100
+
 @router.post("/projects", response_model=ProjectResponse)
-async def create_project(project: ProjectCreate, creator_id: int, db: Session = Depends(get_db)):
-    # Verify creator exists
-    creator = db.query(User).filter(User.id == creator_id).first()
-    if not creator or creator.role != "creator":
-        raise HTTPException(status_code=404, detail="Creator not found")
+async def create_project(project: ProjectCreate, creator_id: Optional[int] = None, principal: Principal = Depends(require_role("creator")), db: AsyncSession = Depends(get_db)):
+    # The creator comes from the token; creator_id is still accepted but must match it
+    ensure_user(principal, creator_id)
     
     db_project = Project(
         name=project.name,
@@ -20,66 +34,147 @@ async def create_project(project: ProjectCreate, creator_id: int, db: Session =
         category=project.category,
         target_revenue=project.target_revenue,
         image_url=project.image_url,
-        creator_id=creator_id
+        creator_id=principal.id
     )
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await invalidate_projects([db_project.id])
+    await db.refresh(db_project)
     
     return ProjectResponse.from_orm(db_project)
 
-@router.get("/projects", response_model=List[ProjectResponse])
-async def get_projects(skip: int = 0, limit: int = 100, category: str = None, db: Session = Depends(get_db)):
-    query = db.query(Project).filter(Project.is_active == True)
+@router.get("/projects", response_model=Union[List[ProjectResponse], ProjectPage])
+async def get_projects(request: Request, skip: int = 0, limit: int = 100, category: str = None, after: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    """List active projects.
+
+    Passing ``after`` (empty for the first page) switches to keyset pagination
+    over (created_at, id) and returns a ``ProjectPage`` envelope; otherwise the
+    legacy skip/limit list is returned. ``fields`` (e.g. ``id,name,creator_id``)
+    trims each project to the listed fields.
+    """
+    etag, not_modified = await conditional_collection(request, db, "projects")
+    if not_modified:
+        return not_modified
+    
+    model = sparse_model(ProjectResponse, fields)
+    query = select(*columns_for(model, Project, "created_at", "id")).where(Project.is_active == True)
     
     if category:
-        query = query.filter(Project.category == category)
+        query = query.where(Project.category == category)
+    
+    if after is not None:
+        projects, next_cursor = await keyset_page(db, query, Project, after, limit)
+        page = ProjectPage if model is ProjectResponse else page_model(model)
+        return cache_headers(model_response(page, {"items": projects, "next_cursor": next_cursor}), etag)
     
-    projects = query.offset(skip).limit(limit).all()
-    return [ProjectResponse.from_orm(project) for project in projects]
+    projects = (await db.execute(query.offset(skip).limit(limit))).all()
+    return cache_headers(list_response(model, projects), etag)
+
+@router.get("/projects/search", response_model=ProjectSearchResult)
+async def search(
+    request: Request,
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    min_target: Optional[float] = None,
+    max_target: Optional[float] = None,
+    min_raised: Optional[float] = None,
+    max_raised: Optional[float] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Full-text search over project name/description with category facets.
+
+    ``min_target``/``max_target`` filter on the funding goal and
+    ``min_raised``/``max_raised`` on the amount raised so far.
+    """
+    etag, not_modified = await conditional_collection(request, db, "projects")
+    if not_modified:
+        return not_modified
+    
+    result = await search_projects(db, q, category, min_target, max_target, min_raised, max_raised, limit, offset)
+    return cache_headers(model_response(ProjectSearchResult, result), etag)
+
+@router.get("/projects/batch", response_model=List[ProjectResponse])
+async def get_projects_batch(request: Request, ids: List[int] = Query([], max_length=MAX_BATCH_IDS), fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    """Projects by id (``?ids=1&ids=2``) in one query, in the order asked for; unknown ids are left out"""
+    if not ids:
+        raise HTTPException(status_code=400, detail="Pass at least one id")
+    etag, not_modified = await conditional_collection(request, db, "projects")
+    if not_modified:
+        return not_modified
+    
+    model = sparse_model(ProjectResponse, fields)
+    rows = (await db.execute(select(*columns_for(model, Project, "id")).where(Project.id.in_(set(ids))))).all()
+    by_id = {row.id: row for row in rows}
+    projects = [by_id[project_id] for project_id in dict.fromkeys(ids) if project_id in by_id]
+    return cache_headers(list_response(model, projects), etag)
+
+@router.get("/projects/investment-counts", response_model=List[ProjectInvestmentCount])
+async def get_project_investment_counts(request: Request, ids: List[int] = Query([], max_length=MAX_BATCH_IDS), db: AsyncSession = Depends(get_read_db)):
+    """Number of investments in each of the given projects, from one grouped query"""
+    if not ids:
+        raise HTTPException(status_code=400, detail="Pass at least one id")
+    etag, not_modified = await conditional_collection(request, db, "investments")
+    if not_modified:
+        return not_modified
+    
+    counts = dict((await db.execute(
+        select(Investment.project_id, func.count()).where(Investment.project_id.in_(set(ids))).group_by(Investment.project_id)
+    )).all())
+    rows = [{"project_id": project_id, "investment_count": counts.get(project_id, 0)} for project_id in dict.fromkeys(ids)]
+    return cache_headers(list_response(ProjectInvestmentCount, rows), etag)
 
 @router.get("/projects/{project_id}", response_model=ProjectResponse)
-async def get_project(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
+async def get_project(project_id: int, request: Request, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    project = await get_cached_project(db, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return ProjectResponse.from_orm(project)
+    response = model_response(sparse_model(ProjectResponse, fields), project)
+    return conditional_entity(request, response, project) or response
 
 @router.put("/projects/{project_id}", response_model=ProjectResponse)
-async def update_project(project_id: int, project_update: ProjectUpdate, db: Session = Depends(get_db)):
-    db_project = db.query(Project).filter(Project.id == project_id).first()
+async def update_project(project_id: int, project_update: ProjectUpdate, principal: Principal = Depends(get_principal), db: AsyncSession = Depends(get_db)):
+    db_project = await db.scalar(select(Project).where(Project.id == project_id))
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
+    ensure_user(principal, db_project.creator_id)
     
     for field, value in project_update.dict(exclude_unset=True).items():
         setattr(db_project, field, value)
     
     db_project.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await invalidate_projects([project_id])
+    await db.refresh(db_project)
     
-    return ProjectResponse.from_orm(db_project)
+    response = ProjectResponse.from_orm(db_project)
+    publish_project(response.model_dump(mode="json"))
+    return response
 
 @router.delete("/projects/{project_id}")
-async def delete_project(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
+async def delete_project(project_id: int, principal: Principal = Depends(get_principal), db: AsyncSession = Depends(get_db)):
+    project = await db.scalar(select(Project).where(Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
+    ensure_user(principal, project.creator_id)
     
     project.is_active = False
-    db.commit()
+    project.updated_at = datetime.utcnow()
+    await db.commit()
+    await invalidate_projects([project_id])
+    publish_project(ProjectResponse.from_orm(project).model_dump(mode="json"), "project.deactivated")
     
     return {"message": "Project deactivated successfully"}
 
 @router.post("/investments", response_model=InvestmentResponse)
-async def create_investment(investment: InvestmentCreate, investor_id: int, db: Session = Depends(get_db)):
-    # Verify investor exists
-    investor = db.query(User).filter(User.id == investor_id).first()
-    if not investor or investor.role != "investor":
-        raise HTTPException(status_code=404, detail="Investor not found")
+async def create_investment(investment: InvestmentCreate, investor_id: Optional[int] = None, principal: Principal = Depends(require_role("investor")), db: AsyncSession = Depends(get_db)):
+    # The investor comes from the token; investor_id is still accepted but must match it
+    ensure_user(principal, investor_id)
+    investor_id = principal.id
     
     # Verify project exists
-    project = db.query(Project).filter(Project.id == investment.project_id).first()
+    project = await get_cached_project(db, investment.project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -88,35 +183,155 @@ async def create_investment(investment: InvestmentCreate, investor_id: int, db:
         nft_token_id=investment.nft_token_id,
         transaction_hash=investment.transaction_hash,
         investor_id=investor_id,
-        project_id=investment.project_id
+        project_id=investment.project_id,
+        counters_applied=False
     )
     db.add(db_investment)
     
-    # Update project revenue
-    project.current_revenue += investment.amount
-    project.updated_at = datetime.utcnow()
+    try:
+        await db.flush()
+    except IntegrityError:
+        # Idempotent replay: a known transaction hash returns the original investment
+        await db.rollback()
+        if not investment.transaction_hash:
+            raise
+        existing = await db.scalar(select(Investment).where(Investment.transaction_hash == investment.transaction_hash))
+        if not existing:
+            raise
+        return _replayed_investment(existing, investment, investor_id)
+    
+    # Project revenue, investor total invested and creator total revenue are added by the
+    # investment.created task, which commits with this insert and runs right after it
+    task = enqueue(db, "investment.created", {
+        "investment_id": db_investment.id,
+        "project_id": investment.project_id,
+        "investor_id": investor_id,
+        "creator_id": project["creator_id"],
+        "amount": investment.amount,
+        "created_at": db_investment.created_at.isoformat(),
+    })
+    await db.commit()
+    task_queue.wake(task.id)
     
-    # Update investor total invested
-    investor.total_invested += investment.amount
-    investor.updated_at = datetime.utcnow()
+    response = InvestmentResponse.from_orm(db_investment)
+    publish_investment(response.model_dump(mode="json"), creator_id=project["creator_id"])
+    return response
+
+def _replayed_investment(existing: Investment, investment: InvestmentCreate, investor_id: int):
+    if (existing.investor_id, existing.project_id, existing.amount) != (investor_id, investment.project_id, investment.amount):
+        raise HTTPException(status_code=409, detail="Transaction hash already recorded for a different investment")
+    return InvestmentResponse.from_orm(existing)
+
+@router.post("/investments/batch", response_model=InvestmentBatchResult)
+async def create_investments_batch(investments: List[InvestmentBatchItem], principal: Principal = Depends(require_role(SERVICE_ROLE)), db: AsyncSession = Depends(get_db)):
+    """Bulk-ingest investments, e.g. a backfill from a chain indexer; needs a service token"""
+    result = InvestmentBatchResult()
+    await ingest_investments(db, list(enumerate(investments)), result)
+    return result
+
+@router.post("/investments/batch/ndjson", response_model=InvestmentBatchResult)
+async def create_investments_ndjson(request: Request, principal: Principal = Depends(require_role(SERVICE_ROLE)), db: AsyncSession = Depends(get_db)):
+    """Bulk-ingest a newline-delimited JSON stream of investments; needs a service token.
+
+    The body is consumed as it arrives and committed every INGEST_CHUNK_SIZE
+    rows, so arbitrarily large backfills run in constant memory. Row indexes
+    in the result are zero-based line numbers.
+    """
+    result = InvestmentBatchResult()
+    pending = []
     
-    # Update creator total revenue
-    creator = db.query(User).filter(User.id == project.creator_id).first()
-    if creator:
-        creator.total_revenue += investment.amount
-        creator.updated_at = datetime.utcnow()
+    async def handle_line(index: int, line: bytes):
+        if not line.strip():
+            return
+        try:
+            pending.append((index, InvestmentBatchItem.model_validate_json(line)))
+        except ValidationError as exc:
+            result.errors.append(InvestmentBatchRowError(index=index, detail="; ".join(f"{'.'.join(map(str, err['loc'])) or 'body'}: {err['msg']}" for err in exc.errors())))
+        if len(pending) >= INGEST_CHUNK_SIZE:
+            await ingest_investments(db, pending, result)
+            pending.clear()
     
-    db.commit()
-    db.refresh(db_investment)
+    index = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            await handle_line(index, line)
+            index += 1
+    await handle_line(index, buffer)
+    await ingest_investments(db, pending, result)
     
-    return InvestmentResponse.from_orm(db_investment)
+    return result
 
-@router.get("/investments", response_model=List[InvestmentResponse])
-async def get_investments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    investments = db.query(Investment).offset(skip).limit(limit).all()
-    return [InvestmentResponse.from_orm(investment) for investment in investments]
+@router.get("/investments", response_model=Union[List[InvestmentResponse], InvestmentPage])
+async def get_investments(request: Request, skip: int = 0, limit: int = 100, after: Optional[str] = None, investor_id: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
+    etag, not_modified = await conditional_collection(request, db, "investments")
+    if not_modified:
+        return not_modified
+    
+    query = select(*columns_for(InvestmentResponse, Investment))
+    if investor_id is not None:
+        query = query.where(Investment.investor_id == investor_id)
+    if after is not None:
+        investments, next_cursor = await keyset_page(db, query, Investment, after, limit)
+        return cache_headers(model_response(InvestmentPage, {"items": investments, "next_cursor": next_cursor}), etag)
+    
+    investments = (await db.execute(query.offset(skip).limit(limit))).all()
+    return cache_headers(list_response(InvestmentResponse, investments), etag)
 
 @router.get("/projects/{project_id}/investments", response_model=List[InvestmentResponse])
-async def get_project_investments(project_id: int, db: Session = Depends(get_db)):
-    investments = db.query(Investment).filter(Investment.project_id == project_id).all()
-    return [InvestmentResponse.from_orm(investment) for investment in investments]
+async def get_project_investments(project_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    etag, not_modified = await conditional_collection(request, db, f"investments:{project_id}")
+    if not_modified:
+        return not_modified
+    
+    investments = (await db.execute(
+        select(*columns_for(InvestmentResponse, Investment)).where(Investment.project_id == project_id)
+    )).all()
+    return cache_headers(list_response(InvestmentResponse, investments), etag)
+
+@router.post("/projects/{project_id}/distributions", response_model=RevenueDistributionResponse)
+async def create_distribution(project_id: int, distribution: RevenueDistributionCreate, principal: Principal = Depends(get_principal), db: AsyncSession = Depends(get_db)):
+    """Pay out project revenue to its investors pro rata to their investments"""
+    project = await get_cached_project(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    ensure_user(principal, project["creator_id"])
+    
+    db_distribution = RevenueDistribution(
+        project_id=project_id,
+        amount=distribution.amount,
+        distribution_percentage=distribution.distribution_percentage,
+        transaction_hash=distribution.transaction_hash
+    )
+    try:
+        paid_investors = await distribute_revenue(db, db_distribution)
+    except IntegrityError:
+        # Idempotent replay: a known transaction hash returns the original distribution
+        await db.rollback()
+        if not distribution.transaction_hash:
+            raise
+        existing = await db.scalar(select(RevenueDistribution).where(RevenueDistribution.transaction_hash == distribution.transaction_hash))
+        if not existing:
+            raise
+        if (existing.project_id, existing.amount, existing.distribution_percentage) != (project_id, distribution.amount, distribution.distribution_percentage):
+            raise HTTPException(status_code=409, detail="Transaction hash already recorded for a different distribution")
+        return RevenueDistributionResponse.from_orm(existing)
+    
+    if not paid_investors:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Project has no invested amount to distribute against")
+    
+    await db.commit()
+    response = RevenueDistributionResponse.from_orm(db_distribution)
+    publish_distribution(response.model_dump(mode="json"), paid_investors)
+    return response
+
+@router.get("/projects/{project_id}/distributions", response_model=List[RevenueDistributionResponse])
+async def get_project_distributions(project_id: int, limit: int = 100, db: AsyncSession = Depends(get_read_db)):
+    distributions = (await db.scalars(
+        select(RevenueDistribution).where(RevenueDistribution.project_id == project_id)
+        .order_by(RevenueDistribution.created_at.desc(), RevenueDistribution.id.desc()).limit(limit)
+    )).all()
+    return [RevenueDistributionResponse.from_orm(distribution) for distribution in distributions]
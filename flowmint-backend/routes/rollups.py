@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import InvestmentRollup
+from replicas import get_read_db
+from models import RollupPoint, RollupSeries
+from rollups import ENTITY_TYPES, GRANULARITIES
+from typing import Optional
+from datetime import datetime, timedelta
+
+router = APIRouter(prefix="/rollups")
+
+MAX_POINTS = 2000
+
+@router.get("/{entity_type}/{entity_id}", response_model=RollupSeries)
+async def get_rollup_series(
+    entity_type: str,
+    entity_id: int,
+    granularity: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(MAX_POINTS, ge=1, le=MAX_POINTS),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Invested amount per hour/day bucket for a project, creator or investor.
+
+    Reads the pre-aggregated rollups by primary key range. Defaults to the last
+    30 days; ``end`` is exclusive. Empty buckets are omitted.
+    """
+    if entity_type not in ENTITY_TYPES:
+        raise HTTPException(status_code=404, detail="Unknown entity type")
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=30)
+    points = (await db.scalars(
+        select(InvestmentRollup)
+        .where(
+            InvestmentRollup.entity_type == entity_type,
+            InvestmentRollup.entity_id == entity_id,
+            InvestmentRollup.granularity == granularity,
+            InvestmentRollup.bucket_start >= start,
+            InvestmentRollup.bucket_start < end,
+        )
+        .order_by(InvestmentRollup.bucket_start)
+        .limit(limit)
+    )).all()
+    return RollupSeries(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        granularity=granularity,
+        points=[RollupPoint.from_orm(point) for point in points],
+    )
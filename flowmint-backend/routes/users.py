@@ -1,32 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db, User, Project, Investment
-from models import UserCreate, UserResponse, UserUpdate, ProjectCreate, ProjectResponse, InvestmentCreate, InvestmentResponse, CreatorDashboard, InvestorDashboard, LoginRequest, AuthResponse
-from typing import List
-import secrets
-from datetime import datetime, timedelta
-import jwt
-import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select, func, distinct, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, User, Project, Investment, RevenuePayout
+from replicas import get_read_db
+from models import UserCreate, UserResponse, UserUpdate, ProjectCreate, ProjectResponse, InvestmentCreate, InvestmentResponse, CreatorDashboard, InvestorDashboard, LoginRequest, AuthResponse, UserPage, RevenuePayoutResponse
+from pagination import keyset_page
+from serialization import columns_for, list_response, model_response, sparse_model, page_model
+from cache import get_cached_user_by_wallet, invalidate_users
+from http_cache import cache_headers, conditional_collection, conditional_entity
+from auth import Principal, create_access_token, ensure_user, get_principal, revoke_token
+from typing import List, Optional, Union
+from datetime import datetime
 
 router = APIRouter()
 
-# JWT Secret (in production, use environment variable)
-
-SECRET_KEY = os.environ.get("SECRET_KEY", "a-default-secret-for-dev")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+MAX_BATCH_IDS = 100
 
 @router.post("/register", response_model=AuthResponse)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user already exists
-    db_user = db.query(User).filter(User.wallet_address == user.wallet_address).first()
+    db_user = await db.scalar(select(User).where(User.wallet_address == user.wallet_address))
     if db_user:
         raise HTTPException(status_code=400, detail="User already registered")
     
@@ -40,11 +33,12 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         profile_image_url=user.profile_image_url
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await invalidate_users([db_user.id])
+    await db.refresh(db_user)
     
     # Create access token
-    access_token = create_access_token(data={"sub": str(db_user.id)})
+    access_token = create_access_token(db_user.id, db_user.role)
     
     return AuthResponse(
         access_token=access_token,
@@ -53,13 +47,13 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
 
 @router.post("/login", response_model=AuthResponse)
-async def login_user(login_data: LoginRequest, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.wallet_address == login_data.wallet_address).first()
+async def login_user(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.wallet_address == login_data.wallet_address))
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Create access token
-    access_token = create_access_token(data={"sub": str(db_user.id)})
+    access_token = create_access_token(db_user.id, db_user.role)
     
     return AuthResponse(
         access_token=access_token,
@@ -67,21 +61,73 @@ async def login_user(login_data: LoginRequest, db: Session = Depends(get_db)):
         user=UserResponse.from_orm(db_user)
     )
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_user(principal: Principal = Depends(get_principal)):
+    """Revoke the bearer token the request was made with"""
+    revoke_token(principal)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @router.get("/user/{wallet_address}", response_model=UserResponse)
-async def get_user(wallet_address: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.wallet_address == wallet_address).first()
+async def get_user(wallet_address: str, request: Request, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    user = await get_cached_user_by_wallet(db, wallet_address.lower())
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return UserResponse.from_orm(user)
+    response = model_response(sparse_model(UserResponse, fields), user)
+    return conditional_entity(request, response, user) or response
 
-@router.get("/users", response_model=List[UserResponse])
-async def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = db.query(User).offset(skip).limit(limit).all()
-    return [UserResponse.from_orm(user) for user in users]
+@router.get("/users", response_model=Union[List[UserResponse], UserPage])
+async def get_users(request: Request, skip: int = 0, limit: int = 100, after: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    etag, not_modified = await conditional_collection(request, db, "users")
+    if not_modified:
+        return not_modified
+    
+    model = sparse_model(UserResponse, fields)
+    query = select(*columns_for(model, User, "created_at", "id"))
+    if after is not None:
+        users, next_cursor = await keyset_page(db, query, User, after, limit)
+        page = UserPage if model is UserResponse else page_model(model)
+        return cache_headers(model_response(page, {"items": users, "next_cursor": next_cursor}), etag)
+    
+    users = (await db.execute(query.offset(skip).limit(limit))).all()
+    return cache_headers(list_response(model, users), etag)
+
+@router.get("/users/batch", response_model=List[UserResponse])
+async def get_users_batch(
+    request: Request,
+    ids: List[int] = Query([], max_length=MAX_BATCH_IDS),
+    wallets: List[str] = Query([], max_length=MAX_BATCH_IDS),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Users by id and/or wallet address in one query, e.g. the creators of a page of projects.
+
+    Results follow the order of ``ids`` then ``wallets``, each user once;
+    unknown ids and wallets are left out.
+    """
+    if not ids and not wallets:
+        raise HTTPException(status_code=400, detail="Pass at least one id or wallet")
+    wallets = [wallet.lower() for wallet in wallets]
+    etag, not_modified = await conditional_collection(request, db, "users")
+    if not_modified:
+        return not_modified
+    
+    model = sparse_model(UserResponse, fields)
+    rows = (await db.execute(
+        select(*columns_for(model, User, "id", "wallet_address"))
+        .where(or_(User.id.in_(set(ids)), User.wallet_address.in_(set(wallets))))
+    )).all()
+    by_key = {**{row.id: row for row in rows}, **{row.wallet_address: row for row in rows}}
+    users = {}
+    for key in [*ids, *wallets]:
+        row = by_key.get(key)
+        if row is not None:
+            users.setdefault(row.id, row)
+    return cache_headers(list_response(model, list(users.values())), etag)
 
 @router.put("/user/{user_id}", response_model=UserResponse)
-async def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.id == user_id).first()
+async def update_user(user_id: int, user_update: UserUpdate, principal: Principal = Depends(get_principal), db: AsyncSession = Depends(get_db)):
+    ensure_user(principal, user_id)
+    db_user = await db.scalar(select(User).where(User.id == user_id))
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -89,45 +135,67 @@ async def update_user(user_id: int, user_update: UserUpdate, db: Session = Depen
         setattr(db_user, field, value)
     
     db_user.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await invalidate_users([user_id])
+    await db.refresh(db_user)
     
     return UserResponse.from_orm(db_user)
 
 @router.get("/creator/{user_id}/dashboard", response_model=CreatorDashboard)
-async def get_creator_dashboard(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def get_creator_dashboard(user_id: int, db: AsyncSession = Depends(get_read_db)):
+    user = (await db.execute(select(*columns_for(UserResponse, User)).where(User.id == user_id))).first()
     if not user or user.role != "creator":
         raise HTTPException(status_code=404, detail="Creator not found")
     
-    projects = db.query(Project).filter(Project.creator_id == user_id).all()
-    investments = db.query(Investment).join(Project).filter(Project.creator_id == user_id).all()
-    
+    projects = (await db.execute(select(*columns_for(ProjectResponse, Project)).where(Project.creator_id == user_id))).all()
     total_revenue = sum(project.current_revenue for project in projects)
-    total_investors = len(set(inv.investor_id for inv in investments))
     
-    return CreatorDashboard(
-        user=UserResponse.from_orm(user),
-        projects=[ProjectResponse.from_orm(project) for project in projects],
+    # Aggregate in the database so the payload doesn't grow with investment history
+    creator_investments = select(*columns_for(InvestmentResponse, Investment)).join(Project).where(Project.creator_id == user_id)
+    total_investors = await db.scalar(
+        select(func.count(distinct(Investment.investor_id))).join(Project).where(Project.creator_id == user_id)
+    )
+    recent_investments = (await db.execute(
+        creator_investments.order_by(Investment.created_at.desc(), Investment.id.desc()).limit(5)
+    )).all()
+    
+    return model_response(CreatorDashboard, dict(
+        user=user,
+        projects=projects,
         total_revenue=total_revenue,
         total_investors=total_investors,
-        recent_investments=[InvestmentResponse.from_orm(inv) for inv in investments[-5:]]
-    )
+        recent_investments=recent_investments
+    ))
 
 @router.get("/investor/{user_id}/dashboard", response_model=InvestorDashboard)
-async def get_investor_dashboard(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def get_investor_dashboard(user_id: int, db: AsyncSession = Depends(get_read_db)):
+    user = (await db.execute(select(*columns_for(UserResponse, User)).where(User.id == user_id))).first()
     if not user or user.role != "investor":
         raise HTTPException(status_code=404, detail="Investor not found")
     
-    investments = db.query(Investment).filter(Investment.investor_id == user_id).all()
-    total_invested = sum(inv.amount for inv in investments)
-    total_projects = len(set(inv.project_id for inv in investments))
+    totals = (await db.execute(
+        select(
+            func.coalesce(func.sum(Investment.amount), 0.0),
+            func.count(distinct(Investment.project_id)),
+            func.count(Investment.id),
+        ).where(Investment.investor_id == user_id)
+    )).one()
+    total_invested, total_projects, total_investments = totals
+    # Only the latest; the full history pages through /api/investments?investor_id=&after=
+    investments = (await db.execute(
+        select(*columns_for(InvestmentResponse, Investment)).where(Investment.investor_id == user_id)
+        .order_by(Investment.created_at.desc(), Investment.id.desc()).limit(20)
+    )).all()
+    recent_revenue = (await db.execute(
+        select(*columns_for(RevenuePayoutResponse, RevenuePayout)).where(RevenuePayout.investor_id == user_id)
+        .order_by(RevenuePayout.created_at.desc(), RevenuePayout.id.desc()).limit(10)
+    )).all()
     
-    return InvestorDashboard(
-        user=UserResponse.from_orm(user),
-        investments=[InvestmentResponse.from_orm(inv) for inv in investments],
+    return model_response(InvestorDashboard, dict(
+        user=user,
+        investments=investments,
         total_invested=total_invested,
         total_projects=total_projects,
-        recent_revenue=[]  # TODO: Implement revenue tracking
-    )
+        total_investments=total_investments,
+        recent_revenue=recent_revenue
+    ))
@@ -0,0 +1,166 @@
+"""In-memory stand-in for an Ethereum JSON-RPC node, for running the indexer locally.
+
+    python rpc_stub.py --port 8545     # then: INDEXER_RPC_URL=http://localhost:8545 python indexer.py
+
+Answers the calls indexer.py makes (``eth_blockNumber``,
+``eth_getBlockByNumber``, ``eth_getLogs`` and ``eth_call`` of ``mintPrice`` and
+``maxSupply``),
+single or batched, from a chain kept in memory. Activity is scripted with
+extra methods, each mining one block:
+
+- ``stub_deploy(creator, mint_price, max_supply=100)`` -> ``{"nft": address, "distributor": address}``
+- ``stub_mint(distributor, to)`` -> token id
+- ``stub_transfer(nft, from, to, token_id)``
+- ``stub_deposit(distributor, amount)``
+- ``stub_mine(count)`` mines empty blocks and returns the new head
+- ``stub_reorg(depth)`` replaces the last ``depth`` blocks with empty ones,
+  dropping their logs
+
+Amounts are raw token units (USDC has 6 decimals). Contract state is not
+rolled back by a reorg, only the logs.
+"""
+import argparse
+import hashlib
+import itertools
+import time
+from fastapi import FastAPI, Request
+from chain import MAX_SUPPLY_SELECTOR, MINT_PRICE_SELECTOR, MINTED_TOPIC, REVENUE_DEPOSITED_TOPIC, TRANSFER_TOPIC, ZERO_ADDRESS
+
+app = FastAPI(title="FlowMint RPC stand-in")
+
+
+def _hash(*parts) -> str:
+    return "0x" + hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def _word(value) -> str:
+    if isinstance(value, str):
+        return "0x" + value[2:].lower().rjust(64, "0")
+    return "0x" + format(value, "064x")
+
+
+class Chain:
+    def __init__(self):
+        self.blocks = []
+        self.contracts = {}  # distributor address -> {"nft", "price", "max_supply", "minted"}
+        self._nonce = itertools.count()
+        self.mine()
+
+    def mine(self, logs=()) -> dict:
+        number = len(self.blocks)
+        parent = self.blocks[-1]["hash"] if self.blocks else "0x" + "0" * 64
+        block_hash = _hash("block", number, parent, next(self._nonce))
+        for index, log in enumerate(logs):
+            log.update(blockNumber=hex(number), blockHash=block_hash, logIndex=hex(index), transactionIndex="0x0", removed=False)
+        block = {"number": hex(number), "hash": block_hash, "parentHash": parent, "timestamp": hex(int(time.time())), "logs": list(logs)}
+        self.blocks.append(block)
+        return block
+
+    def _log(self, address, topics, data="0x", tx_hash=None):
+        return {"address": address, "topics": topics, "data": data, "transactionHash": tx_hash or _hash("tx", next(self._nonce))}
+
+    def deploy(self, creator, mint_price, max_supply=100):
+        distributor = "0x" + _hash("distributor", creator, next(self._nonce))[-40:]
+        nft = "0x" + _hash("nft", distributor)[-40:]
+        self.contracts[distributor] = {"nft": nft, "price": int(mint_price), "max_supply": int(max_supply), "minted": 0}
+        self.mine()
+        return {"nft": nft, "distributor": distributor}
+
+    def mint(self, distributor, to):
+        contract = self.contracts[distributor.lower()]
+        token_id = contract["minted"]
+        contract["minted"] += 1
+        tx_hash = _hash("tx", next(self._nonce))
+        self.mine([
+            self._log(contract["nft"], [TRANSFER_TOPIC, _word(ZERO_ADDRESS), _word(to), _word(token_id)], tx_hash=tx_hash),
+            self._log(distributor.lower(), [MINTED_TOPIC, _word(to), _word(token_id)], tx_hash=tx_hash),
+        ])
+        return token_id
+
+    def transfer(self, nft, sender, recipient, token_id):
+        self.mine([self._log(nft.lower(), [TRANSFER_TOPIC, _word(sender), _word(recipient), _word(int(token_id))])])
+
+    def deposit(self, distributor, amount):
+        self.mine([self._log(distributor.lower(), [REVENUE_DEPOSITED_TOPIC], _word(int(amount)))])
+
+    def mine_empty(self, count):
+        for _ in range(int(count)):
+            self.mine()
+        return hex(len(self.blocks) - 1)
+
+    def reorg(self, depth):
+        depth = min(int(depth), len(self.blocks) - 1)
+        del self.blocks[len(self.blocks) - depth:]
+        for _ in range(depth):
+            self.mine()
+
+    def get_logs(self, query):
+        start = int(query.get("fromBlock", "0x0"), 16)
+        end = min(int(query.get("toBlock", hex(len(self.blocks) - 1)), 16), len(self.blocks) - 1)
+        addresses = query.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {address.lower() for address in addresses} if addresses else None
+        topics = (query.get("topics") or [None])[0]
+        if isinstance(topics, str):
+            topics = [topics]
+        return [
+            log for block in self.blocks[start:end + 1] for log in block["logs"]
+            if (addresses is None or log["address"] in addresses) and (not topics or log["topics"][0] in topics)
+        ]
+
+    def call(self, request):
+        contract = self.contracts.get(request["to"].lower())
+        getter = {MINT_PRICE_SELECTOR: "price", MAX_SUPPLY_SELECTOR: "max_supply"}.get(request.get("data", "")[:10])
+        if contract is None or getter is None:
+            raise ValueError("execution reverted")
+        return _word(contract[getter])
+
+    def block(self, number):
+        index = len(self.blocks) - 1 if number == "latest" else int(number, 16)
+        if index >= len(self.blocks):
+            return None
+        block = self.blocks[index]
+        return {key: value for key, value in block.items() if key != "logs"}
+
+
+chain = Chain()
+
+METHODS = {
+    "eth_blockNumber": lambda: hex(len(chain.blocks) - 1),
+    "eth_getBlockByNumber": lambda number, full=False: chain.block(number),
+    "eth_getLogs": chain.get_logs,
+    "eth_call": lambda request, block="latest": chain.call(request),
+    "stub_deploy": chain.deploy,
+    "stub_mint": chain.mint,
+    "stub_transfer": chain.transfer,
+    "stub_deposit": chain.deposit,
+    "stub_mine": chain.mine_empty,
+    "stub_reorg": chain.reorg,
+}
+
+
+def handle(request: dict) -> dict:
+    reply = {"jsonrpc": "2.0", "id": request.get("id")}
+    method = METHODS.get(request.get("method"))
+    if method is None:
+        return {**reply, "error": {"code": -32601, "message": f"Method {request.get('method')} not found"}}
+    try:
+        return {**reply, "result": method(*request.get("params", []))}
+    except (TypeError, ValueError, KeyError) as exc:
+        return {**reply, "error": {"code": -32000, "message": str(exc)}}
+
+
+@app.post("/")
+async def rpc(request: Request):
+    body = await request.json()
+    if isinstance(body, list):
+        return [handle(item) for item in body]
+    return handle(body)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8545)
+    uvicorn.run(app, host="127.0.0.1", port=parser.parse_args().port)
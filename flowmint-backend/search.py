@@ -0,0 +1,115 @@
+"""Project search over the full-text index added in migration 0006.
+
+SQLite matches against the ``projects_fts`` FTS5 table and ranks by bm25;
+Postgres matches the generated ``projects.search_vector`` column and ranks
+by ts_rank_cd. Both take the same tokenized query, with the last term
+prefix-matched so partially typed words still hit.
+"""
+import hashlib
+import json
+import re
+from typing import Optional
+from sqlalchemy import select, func, column, table, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Project
+from cache import cache, collection_version
+from models import ProjectResponse
+from serialization import columns_for
+
+projects_fts = table("projects_fts", column("rowid"))
+search_vector = literal_column("projects.search_vector")
+
+
+def query_terms(q: Optional[str]):
+    return re.findall(r"\w+", q or "")[:16]
+
+
+def _matches(dialect: str, terms, scored: bool):
+    """CTE of project ids matching ``terms``, plus a score (higher is better) if ``scored``.
+
+    Materializing it makes the full-text index drive the join; otherwise
+    SQLite plans from the is_active index and runs MATCH once per project.
+    Scoring costs about as much as the match itself, so facet counts skip it.
+    """
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery("english", " & ".join(terms[:-1] + [f"{terms[-1]}:*"]))
+        columns = [Project.id.label("id")] + ([func.ts_rank_cd(search_vector, tsquery).label("score")] if scored else [])
+        matches = select(*columns).where(search_vector.op("@@")(tsquery))
+    else:
+        fts_query = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        fts = literal_column("projects_fts")
+        columns = [projects_fts.c.rowid.label("id")] + ([(-func.bm25(fts)).label("score")] if scored else [])
+        matches = select(*columns).where(fts.op("MATCH")(fts_query))
+    return matches.cte("matches").prefix_with("MATERIALIZED")
+
+
+async def search_projects(
+    db: AsyncSession,
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    min_target: Optional[float] = None,
+    max_target: Optional[float] = None,
+    min_raised: Optional[float] = None,
+    max_raised: Optional[float] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> dict:
+    """Active projects matching ``q`` and the funding filters, best match first.
+
+    Facet counts cover every category matching the other filters, so the
+    frontend can show what switching category would return. Results are
+    cached per version of the projects collection, so a popular search hits
+    the database once between project writes. The version is read through
+    ``db``, so results from a lagging replica are cached under its version.
+    """
+    terms = query_terms(q)
+    params = [terms, category, min_target, max_target, min_raised, max_raised, limit, offset]
+    key = f"search:{await collection_version(db, 'projects')}:{hashlib.sha1(json.dumps(params).encode()).hexdigest()}"
+    result = await cache.get(key)
+    if result is None:
+        result = await _search(db, terms, category, min_target, max_target, min_raised, max_raised, limit, offset)
+        await cache.set(key, result)
+    return result
+
+
+async def _search(db, terms, category, min_target, max_target, min_raised, max_raised, limit, offset) -> dict:
+    filters = [Project.is_active == True]
+    if min_target is not None:
+        filters.append(Project.target_revenue >= min_target)
+    if max_target is not None:
+        filters.append(Project.target_revenue <= max_target)
+    if min_raised is not None:
+        filters.append(Project.current_revenue >= min_raised)
+    if max_raised is not None:
+        filters.append(Project.current_revenue <= max_raised)
+    
+    dialect = db.bind.dialect.name
+    source = Project.__table__
+    if terms:
+        matches = _matches(dialect, terms, scored=False)
+        source = matches.join(Project, Project.id == matches.c.id)
+    facet_rows = (await db.execute(
+        select(Project.category, func.count()).select_from(source).where(*filters)
+        .group_by(Project.category).order_by(func.count().desc())
+    )).all()
+    facets = [{"category": name, "count": count} for name, count in facet_rows]
+    
+    if category:
+        filters.append(Project.category == category)
+        total = next((facet["count"] for facet in facets if facet["category"] == category), 0)
+    else:
+        total = sum(facet["count"] for facet in facets)
+    
+    items = []
+    if total > offset:
+        order_by = [Project.created_at.desc(), Project.id.desc()]
+        if terms:
+            matches = _matches(dialect, terms, scored=True)
+            source = matches.join(Project, Project.id == matches.c.id)
+            order_by.insert(0, matches.c.score.desc())
+        rows = (await db.execute(
+            select(*columns_for(ProjectResponse, Project)).select_from(source).where(*filters)
+            .order_by(*order_by).offset(offset).limit(limit)
+        )).all()
+        items = [ProjectResponse.model_validate(row._asdict()).model_dump(mode="json") for row in rows]
+    return {"items": items, "total": total, "facets": facets}
@@ -0,0 +1,241 @@
+"""Demo and synthetic data, loaded by ``python manage.py seed`` and bench.py.
+
+Both seeders use bulk inserts in as few transactions as possible and are
+safe to re-run: demo rows are matched on wallet address / transaction
+hash, and a synthetic dataset is skipped if its first creator exists.
+"""
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select, update, bindparam
+from database import User, Project, Investment
+from rollups import rebuild_rollups
+
+DEMO_USERS = [
+    {
+        "wallet_address": "0x1234567890123456789012345678901234567890",
+        "username": "alice_creator",
+        "email": "alice@example.com",
+        "role": "creator",
+        "bio": "AI Artist creating unique digital masterpieces",
+        "profile_image_url": "https://images.unsplash.com/photo-1494790108755-2616b612b786?w=150&h=150&fit=crop&crop=face"
+    },
+    {
+        "wallet_address": "0x2345678901234567890123456789012345678901",
+        "username": "bob_creator",
+        "email": "bob@example.com",
+        "role": "creator",
+        "bio": "Music producer and composer",
+        "profile_image_url": "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=150&h=150&fit=crop&crop=face"
+    },
+    {
+        "wallet_address": "0x3456789012345678901234567890123456789012",
+        "username": "charlie_investor",
+        "email": "charlie@example.com",
+        "role": "investor",
+        "bio": "Crypto investor and NFT enthusiast",
+        "profile_image_url": "https://images.unsplash.com/photo-1472099645785-5658abf4ff4e?w=150&h=150&fit=crop&crop=face"
+    },
+    {
+        "wallet_address": "0x4567890123456789012345678901234567890123",
+        "username": "diana_investor",
+        "email": "diana@example.com",
+        "role": "investor",
+        "bio": "Early stage investor in creative projects",
+        "profile_image_url": "https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=150&h=150&fit=crop&crop=face"
+    }
+]
+
+# creator is an index into the demo creators
+DEMO_PROJECTS = [
+    {
+        "name": "Cyber Wolf NFT Collection",
+        "description": "A unique collection of AI-generated wolf NFTs with cyberpunk aesthetics",
+        "category": "art",
+        "target_revenue": 10000.0,
+        "nft_token_id": 1,
+        "nft_contract_address": "0x1234567890123456789012345678901234567890",
+        "image_url": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400&h=300&fit=crop",
+        "creator": 0
+    },
+    {
+        "name": "Neon Tiger Music Project",
+        "description": "Electronic music album with NFT ownership rights",
+        "category": "music",
+        "target_revenue": 5000.0,
+        "nft_token_id": 2,
+        "nft_contract_address": "0x1234567890123456789012345678901234567890",
+        "image_url": "https://images.unsplash.com/photo-1493225457124-a3eb161ffa5f?w=400&h=300&fit=crop",
+        "creator": 1
+    },
+    {
+        "name": "Tech Innovation Hub",
+        "description": "Revolutionary tech project with revenue sharing",
+        "category": "tech",
+        "target_revenue": 25000.0,
+        "nft_token_id": 3,
+        "nft_contract_address": "0x1234567890123456789012345678901234567890",
+        "image_url": "https://images.unsplash.com/photo-1518709268805-4e9042af2176?w=400&h=300&fit=crop",
+        "creator": 0
+    }
+]
+
+# investor and project are indexes into the demo investors/projects
+DEMO_INVESTMENTS = [
+    {"amount": 500.0, "nft_token_id": 1, "transaction_hash": "0xdemo0001", "investor": 0, "project": 0},
+    {"amount": 1000.0, "nft_token_id": 1, "transaction_hash": "0xdemo0002", "investor": 1, "project": 0},
+    {"amount": 300.0, "nft_token_id": 2, "transaction_hash": "0xdemo0003", "investor": 0, "project": 1},
+    {"amount": 2000.0, "nft_token_id": 3, "transaction_hash": "0xdemo0004", "investor": 1, "project": 2},
+]
+
+
+def seed_demo(engine) -> int:
+    """Insert the demo users, projects and investments that are missing; returns rows added"""
+    added = 0
+    with engine.begin() as conn:
+        wallets = [user["wallet_address"] for user in DEMO_USERS]
+        existing = set(conn.scalars(select(User.wallet_address).where(User.wallet_address.in_(wallets))))
+        new_users = [user for user in DEMO_USERS if user["wallet_address"] not in existing]
+        if new_users:
+            conn.execute(insert(User), new_users)
+            added += len(new_users)
+        ids = dict(conn.execute(select(User.wallet_address, User.id).where(User.wallet_address.in_(wallets))).all())
+        creators = [ids[user["wallet_address"]] for user in DEMO_USERS if user["role"] == "creator"]
+        investors = [ids[user["wallet_address"]] for user in DEMO_USERS if user["role"] == "investor"]
+
+        names = [project["name"] for project in DEMO_PROJECTS]
+        project_ids = dict(conn.execute(
+            select(Project.name, Project.id).where(Project.name.in_(names), Project.creator_id.in_(creators))
+        ).all())
+        new_projects = [
+            {**{k: v for k, v in project.items() if k != "creator"}, "creator_id": creators[project["creator"]]}
+            for project in DEMO_PROJECTS if project["name"] not in project_ids
+        ]
+        if new_projects:
+            conn.execute(insert(Project), new_projects)
+            added += len(new_projects)
+            project_ids = dict(conn.execute(
+                select(Project.name, Project.id).where(Project.name.in_(names), Project.creator_id.in_(creators))
+            ).all())
+        projects = [project_ids[name] for name in names]
+
+        hashes = [investment["transaction_hash"] for investment in DEMO_INVESTMENTS]
+        existing = set(conn.scalars(select(Investment.transaction_hash).where(Investment.transaction_hash.in_(hashes))))
+        new_investments = [
+            {
+                "amount": investment["amount"],
+                "nft_token_id": investment["nft_token_id"],
+                "transaction_hash": investment["transaction_hash"],
+                "investor_id": investors[investment["investor"]],
+                "project_id": projects[investment["project"]],
+            }
+            for investment in DEMO_INVESTMENTS if investment["transaction_hash"] not in existing
+        ]
+        if new_investments:
+            conn.execute(insert(Investment), new_investments)
+            added += len(new_investments)
+            _total_demo_counters(conn, projects, creators, investors)
+    return added
+
+
+def _total_demo_counters(conn, project_ids, creator_ids, investor_ids):
+    """Set the demo rows' running totals to the sums of their investments, as ledger.reconcile_counters would"""
+    now = datetime.utcnow()
+    invested = select(func.coalesce(func.sum(Investment.amount), 0.0)).where(Investment.counters_applied.is_(True))
+    conn.execute(
+        update(Project).where(Project.id.in_(project_ids))
+        .values(current_revenue=invested.where(Investment.project_id == Project.id).scalar_subquery(), updated_at=now)
+    )
+    conn.execute(
+        update(User).where(User.id.in_(investor_ids))
+        .values(total_invested=invested.where(Investment.investor_id == User.id).scalar_subquery(), updated_at=now)
+    )
+    creator_projects = select(Project.id).where(Project.creator_id == User.id).correlate(User)
+    conn.execute(
+        update(User).where(User.id.in_(creator_ids))
+        .values(total_revenue=invested.where(Investment.project_id.in_(creator_projects)).scalar_subquery(), updated_at=now)
+    )
+
+
+def seed_synthetic(engine, creators=200, investors=5000, projects=1000, investments=100000, seed=42, chunk=10000):
+    """Bulk-insert a load-test dataset with consistent counters and rollups.
+
+    Returns (creator_ids, investor_ids, project_ids), or None if a dataset
+    was already seeded.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    creator_rows = [
+        dict(wallet_address=f"0xc{i:039x}", username=f"creator{i}", role="creator", created_at=now, updated_at=now)
+        for i in range(creators)
+    ]
+    investor_rows = [
+        dict(wallet_address=f"0xa{i:039x}", username=f"investor{i}", role="investor", created_at=now, updated_at=now)
+        for i in range(investors)
+    ]
+    with engine.begin() as conn:
+        if creator_rows and conn.scalar(select(User.id).where(User.wallet_address == creator_rows[0]["wallet_address"])):
+            return None
+        conn.execute(insert(User), creator_rows + investor_rows)
+        synthetic_creators = select(User.id).where(User.wallet_address.like("0xc%"), User.username.like("creator%"))
+        creator_ids = list(conn.scalars(synthetic_creators))
+        investor_ids = list(conn.scalars(select(User.id).where(User.wallet_address.like("0xa%"), User.username.like("investor%"))))
+
+        categories = ["music", "art", "tech", "gaming"]
+        conn.execute(insert(Project), [
+            dict(
+                name=f"Project {i}",
+                description=f"Synthetic project {i} for load testing",
+                category=rng.choice(categories),
+                target_revenue=rng.choice([5000.0, 10000.0, 50000.0]),
+                current_revenue=0.0,
+                is_active=rng.random() > 0.05,
+                creator_id=rng.choice(creator_ids),
+                created_at=now - timedelta(days=rng.randint(0, 365)),
+                updated_at=now,
+            )
+            for i in range(projects)
+        ])
+        project_creators = dict(conn.execute(
+            select(Project.id, Project.creator_id).where(Project.creator_id.in_(synthetic_creators))
+        ).all())
+        project_ids = list(project_creators)
+
+    project_totals = defaultdict(float)
+    investor_totals = defaultdict(float)
+    creator_totals = defaultdict(float)
+    for start in range(0, investments, chunk):
+        rows = []
+        for i in range(start, min(start + chunk, investments)):
+            project_id = rng.choice(project_ids)
+            investor_id = rng.choice(investor_ids)
+            amount = round(rng.uniform(10, 2000), 2)
+            created_at = now - timedelta(seconds=rng.randint(0, 30 * 24 * 3600))
+            rows.append(dict(
+                amount=amount, nft_token_id=project_id, transaction_hash=f"0xbench{i:x}",
+                investor_id=investor_id, project_id=project_id, created_at=created_at,
+            ))
+            project_totals[project_id] += amount
+            investor_totals[investor_id] += amount
+            creator_totals[project_creators[project_id]] += amount
+        with engine.begin() as conn:
+            conn.execute(insert(Investment), rows)
+
+    with engine.begin() as conn:
+        if project_totals:
+            conn.execute(
+                update(Project).where(Project.id == bindparam("pid")).values(current_revenue=bindparam("total")),
+                [dict(pid=k, total=v) for k, v in project_totals.items()],
+            )
+            conn.execute(
+                update(User).where(User.id == bindparam("uid")).values(total_invested=bindparam("total")),
+                [dict(uid=k, total=v) for k, v in investor_totals.items()],
+            )
+            conn.execute(
+                update(User).where(User.id == bindparam("uid")).values(total_revenue=bindparam("total")),
+                [dict(uid=k, total=v) for k, v in creator_totals.items()],
+            )
+        rebuild_rollups(conn)
+
+    return creator_ids, investor_ids, project_ids
@@ -0,0 +1,70 @@
+from functools import lru_cache
+from typing import List, Optional
+from fastapi import HTTPException, Response
+from pydantic import TypeAdapter, create_model
+from sqlalchemy.engine import Row
+
+
+def columns_for(model, entity, *extra):
+    """Columns of ``entity`` named like the fields of response ``model``.
+
+    Selecting these instead of the ORM entity skips identity-map and
+    instance construction; the resulting rows validate straight into
+    ``model``. ``extra`` names columns the handler needs for itself (e.g.
+    ``id`` to order results), which validation then ignores.
+    """
+    names = list(model.model_fields) + [name for name in extra if name not in model.model_fields]
+    return [getattr(entity, name) for name in names]
+
+
+def sparse_model(model, fields: Optional[str]):
+    """``model`` cut down to the comma-separated ``fields``, or ``model`` itself if none are given"""
+    requested = {name.strip() for name in (fields or "").split(",") if name.strip()}
+    if not requested:
+        return model
+    unknown = requested - model.model_fields.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return _sparse_model(model, tuple(name for name in model.model_fields if name in requested))
+
+
+@lru_cache(maxsize=256)
+def _sparse_model(model, names):
+    return create_model(f"{model.__name__}Fields", **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in names})
+
+
+@lru_cache(maxsize=256)
+def page_model(item_model):
+    """Cursor page envelope (like ``ProjectPage``) around a sparse item model"""
+    return create_model(f"{item_model.__name__}Page", items=(List[item_model], ...), next_cursor=(Optional[str], None))
+
+
+def _plain(value):
+    """Turn result rows into dicts so validation doesn't pay for per-attribute Row lookups"""
+    if isinstance(value, Row):
+        return dict(zip(value._fields, value))
+    if isinstance(value, list) and value and isinstance(value[0], Row):
+        fields = value[0]._fields
+        return [dict(zip(fields, row)) for row in value]
+    return value
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model):
+    return TypeAdapter(List[model])
+
+
+def list_response(model, rows) -> Response:
+    """Validate rows into ``List[model]`` once and serialize them in pydantic-core.
+
+    Returning the Response directly stops FastAPI from validating and
+    encoding the payload a second time against ``response_model``.
+    """
+    adapter = _list_adapter(model)
+    return Response(adapter.dump_json(adapter.validate_python(_plain(rows))), media_type="application/json")
+
+
+def model_response(model, data: dict) -> Response:
+    """Single-pass equivalent of ``list_response`` for envelope/dashboard models"""
+    data = {key: _plain(value) for key, value in data.items()}
+    return Response(model.model_validate(data).model_dump_json(), media_type="application/json")
@@ -0,0 +1,292 @@
+"""In-process work queue backed by a transactional outbox.
+
+A write with follow-up work calls ``enqueue`` before committing, so the
+``OutboxTask`` row exists if and only if the write does, then calls
+``queue.wake`` to have it picked up straight away. Tasks that were never
+woken (another worker took the write, or the process died) are found by the
+poller every TASK_POLL_SECONDS.
+
+Each worker process runs TASK_CONCURRENCY workers. A worker claims a task
+with a single conditional UPDATE that takes a TASK_LEASE_SECONDS lease, so a
+task runs in one place at a time, and one whose worker died is reclaimed
+when the lease runs out. The handler's changes and the task's ``done`` mark
+commit together. Failures are retried with exponential backoff and give up
+as ``failed`` after TASK_MAX_ATTEMPTS.
+
+Handlers are ``async (db, payload)`` registered with ``@handler(kind)``.
+They must not commit; they may return an async callable to run after the
+commit, e.g. to invalidate the cache.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, Investment, OutboxTask
+from cache import invalidate_investment_targets, invalidate_projects, invalidate_users
+from ledger import apply_investment_deltas, reconcile_counters
+
+TASK_CONCURRENCY = int(os.environ.get("TASK_CONCURRENCY", "4"))
+TASK_MAX_ATTEMPTS = int(os.environ.get("TASK_MAX_ATTEMPTS", "8"))
+TASK_RETRY_BASE_SECONDS = float(os.environ.get("TASK_RETRY_BASE_SECONDS", "1"))
+TASK_RETRY_MAX_SECONDS = float(os.environ.get("TASK_RETRY_MAX_SECONDS", "300"))
+TASK_LEASE_SECONDS = float(os.environ.get("TASK_LEASE_SECONDS", "60"))
+TASK_POLL_SECONDS = float(os.environ.get("TASK_POLL_SECONDS", "2"))
+TASK_RETENTION_HOURS = float(os.environ.get("TASK_RETENTION_HOURS", "24"))
+RECONCILE_INTERVAL_SECONDS = float(os.environ.get("RECONCILE_INTERVAL_SECONDS", "3600"))  # 0 = off
+
+logger = logging.getLogger("flowmint.tasks")
+
+HANDLERS = {}
+
+
+def handler(kind: str):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(db: AsyncSession, kind: str, payload: dict, dedupe_key: Optional[str] = None,
+            run_after: Optional[datetime] = None) -> OutboxTask:
+    """Add a task to ``db``'s transaction; it is only visible to workers once that commits"""
+    task = OutboxTask(kind=kind, payload=json.dumps(payload), dedupe_key=dedupe_key, run_after=run_after or datetime.utcnow())
+    db.add(task)
+    return task
+
+
+class TaskQueue:
+    def __init__(self, session_factory=AsyncSessionLocal, concurrency: int = TASK_CONCURRENCY):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.results = Counter()
+        self._ready = asyncio.Queue()
+        self._queued = set()
+        self._workers = []
+        self._loops = []
+        self._event_loop = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def _on_own_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._event_loop
+        except RuntimeError:
+            return False
+
+    def wake(self, task_id: int):
+        """Run ``task_id`` as soon as a worker is free.
+
+        A no-op before ``start`` or outside the queue's event loop; the poller
+        picks the task up then.
+        """
+        if self.running and self._on_own_loop() and task_id not in self._queued:
+            self._queued.add(task_id)
+            self._ready.put_nowait(task_id)
+
+    async def start(self):
+        if self.running:
+            return
+        self._event_loop = asyncio.get_running_loop()
+        self._ready = asyncio.Queue()
+        self._queued.clear()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._loops = [asyncio.create_task(self._poll()), asyncio.create_task(self._schedule())]
+
+    async def stop(self, timeout: float = 10):
+        """Stop polling and let workers finish the task in hand; anything unfinished is rerun later"""
+        if not self.running or not self._on_own_loop():
+            return
+        for loop in self._loops:
+            loop.cancel()
+        for _ in self._workers:
+            self._ready.put_nowait(None)
+        _, unfinished = await asyncio.wait(self._workers, timeout=timeout)
+        for worker in unfinished:
+            worker.cancel()
+        await asyncio.gather(*self._loops, *self._workers, return_exceptions=True)
+        self._workers, self._loops = [], []
+
+    async def _work(self):
+        while True:
+            task_id = await self._ready.get()
+            if task_id is None:
+                return
+            self._queued.discard(task_id)
+            try:
+                await self.run(task_id)
+            except Exception:
+                # e.g. the database is unreachable; the poller finds the task again
+                logger.exception("Task %s could not be run", task_id)
+
+    async def run(self, task_id: int) -> bool:
+        """Claim and run one task; False if it wasn't due, was taken elsewhere or failed"""
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=TASK_LEASE_SECONDS)
+        async with self.session_factory() as db:
+            claimed = await db.execute(
+                update(OutboxTask)
+                .where(
+                    OutboxTask.id == task_id,
+                    or_(
+                        and_(OutboxTask.status == "pending", OutboxTask.run_after <= now),
+                        and_(OutboxTask.status == "running", OutboxTask.locked_until < now),
+                    ),
+                )
+                .values(status="running", attempts=OutboxTask.attempts + 1, locked_until=lease)
+            )
+            await db.commit()
+            if claimed.rowcount != 1:
+                return False
+            task = (await db.execute(
+                select(OutboxTask.kind, OutboxTask.payload, OutboxTask.attempts).where(OutboxTask.id == task_id)
+            )).one()
+
+            try:
+                after_commit = await HANDLERS[task.kind](db, json.loads(task.payload))
+                finished = await db.execute(
+                    update(OutboxTask)
+                    .where(OutboxTask.id == task_id, OutboxTask.locked_until == lease)
+                    .values(status="done", finished_at=datetime.utcnow(), locked_until=None, last_error=None)
+                )
+                if finished.rowcount != 1:
+                    # Our lease ran out and another worker has the task now
+                    await db.rollback()
+                    return False
+                await db.commit()
+            except Exception as exc:
+                await db.rollback()
+                await self._retry(db, task_id, task.kind, task.attempts, lease, exc)
+                return False
+
+        self.results["done"] += 1
+        if after_commit is not None:
+            try:
+                await after_commit()
+            except Exception:
+                logger.exception("Post-commit step of task %s (%s) failed", task_id, task.kind)
+        return True
+
+    async def _retry(self, db: AsyncSession, task_id: int, kind: str, attempts: int, lease: datetime, exc: Exception):
+        failed = attempts >= TASK_MAX_ATTEMPTS
+        delay = min(TASK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), TASK_RETRY_MAX_SECONDS)
+        await db.execute(
+            update(OutboxTask)
+            .where(OutboxTask.id == task_id, OutboxTask.locked_until == lease)
+            .values(
+                status="failed" if failed else "pending",
+                run_after=datetime.utcnow() + timedelta(seconds=delay),
+                locked_until=None,
+                last_error=repr(exc)[:2000],
+            )
+        )
+        await db.commit()
+        if failed:
+            self.results["failed"] += 1
+            logger.error("Task %s (%s) failed after %d attempts: %r", task_id, kind, attempts, exc)
+        else:
+            self.results["retried"] += 1
+            logger.warning("Task %s (%s) failed, retrying in %.0fs: %r", task_id, kind, delay, exc)
+
+    async def _poll(self):
+        while True:
+            try:
+                await self._wake_due()
+            except Exception:
+                logger.exception("Polling for due tasks failed")
+            await asyncio.sleep(TASK_POLL_SECONDS)
+
+    async def _wake_due(self, limit: int = 500):
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            due = (await db.execute(
+                select(OutboxTask.id)
+                .where(or_(
+                    and_(OutboxTask.status == "pending", OutboxTask.run_after <= now),
+                    and_(OutboxTask.status == "running", OutboxTask.locked_until < now),
+                ))
+                .order_by(OutboxTask.id)
+                .limit(limit)
+            )).scalars().all()
+        for task_id in due:
+            self.wake(task_id)
+
+    async def _schedule(self):
+        """Periodic jobs, aligned to wall-clock intervals so all workers agree on the slot"""
+        interval = RECONCILE_INTERVAL_SECONDS or 3600
+        while True:
+            await asyncio.sleep(interval - time.time() % interval)
+            try:
+                if RECONCILE_INTERVAL_SECONDS:
+                    # The dedupe key makes one worker's task the only one for this slot
+                    await self.enqueue_once("ledger.reconcile", {}, f"ledger.reconcile:{int(time.time() // interval)}")
+                await self.purge()
+            except Exception:
+                logger.exception("Scheduling periodic tasks failed")
+
+    async def enqueue_once(self, kind: str, payload: dict, dedupe_key: str) -> Optional[int]:
+        """Enqueue and wake a task unless one with ``dedupe_key`` already exists"""
+        async with self.session_factory() as db:
+            task = enqueue(db, kind, payload, dedupe_key)
+            try:
+                await db.commit()
+            except IntegrityError:
+                return None
+        self.wake(task.id)
+        return task.id
+
+    async def purge(self) -> int:
+        """Delete tasks done more than TASK_RETENTION_HOURS ago; failed ones are kept for inspection"""
+        cutoff = datetime.utcnow() - timedelta(hours=TASK_RETENTION_HOURS)
+        async with self.session_factory() as db:
+            result = await db.execute(delete(OutboxTask).where(OutboxTask.status == "done", OutboxTask.finished_at < cutoff))
+            await db.commit()
+        return result.rowcount
+
+    async def stats(self):
+        async with self.session_factory() as db:
+            counts = dict((await db.execute(select(OutboxTask.status, func.count()).group_by(OutboxTask.status))).all())
+        return {"tasks": counts, "queued": self._ready.qsize(), "workers": len(self._workers), "results": dict(self.results)}
+
+
+queue = TaskQueue()
+
+
+@handler("investment.created")
+async def apply_investment(db: AsyncSession, payload: dict):
+    """Add an investment to the running totals and rollups, exactly once"""
+    marked = await db.execute(
+        update(Investment)
+        .where(Investment.id == payload["investment_id"], Investment.counters_applied.is_(False))
+        .values(counters_applied=True)
+    )
+    if marked.rowcount != 1:
+        return None
+    deltas = [(payload["project_id"], payload["investor_id"], payload["creator_id"], payload["amount"])]
+    await apply_investment_deltas(db, deltas, datetime.fromisoformat(payload["created_at"]))
+
+    async def invalidate():
+        await invalidate_investment_targets(deltas)
+    return invalidate
+
+
+@handler("ledger.reconcile")
+async def reconcile(db: AsyncSession, payload: dict):
+    """Fix running totals that drifted from the investment sums"""
+    project_ids, user_ids = await reconcile_counters(db)
+    if not (project_ids or user_ids):
+        return None
+    logger.warning("Reconciliation corrected %d projects and %d users", len(project_ids), len(user_ids))
+
+    async def invalidate():
+        await invalidate_projects(project_ids)
+        await invalidate_users(user_ids)
+    return invalidate
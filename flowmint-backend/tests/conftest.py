@@ -0,0 +1,54 @@
+"""Every test session runs against a fresh SQLite database in a temporary directory."""
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='flowmint-tests-')}/flowmint.db"
+os.environ["CACHE_BACKEND"] = "none"
+os.environ["RATE_LIMIT_BACKEND"] = "none"
+os.environ["INDEXER_CONFIRMATIONS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import delete
+from database import Base, Project, SessionLocal, User, async_engine, engine, run_migrations
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    run_migrations()
+
+
+@pytest.fixture(autouse=True)
+def clean_tables():
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def async_db(anyio_backend):
+    """Drops pooled async connections afterwards, as each test has its own event loop"""
+    yield
+    await async_engine.dispose()
+
+
+@pytest.fixture
+def project():
+    """A project with its creator, and an investor with nothing invested yet"""
+    with SessionLocal() as db:
+        creator = User(wallet_address="0x" + "c" * 40, role="creator")
+        investor = User(wallet_address="0x" + "d" * 40, role="investor")
+        db.add_all([creator, investor])
+        db.flush()
+        row = Project(name="Test project", creator_id=creator.id)
+        db.add(row)
+        db.commit()
+        return SimpleNamespace(id=row.id, creator_id=creator.id, investor_id=investor.id)
@@ -0,0 +1,91 @@
+"""Bearer tokens on the write endpoints: who gets a 401, who gets a 403, and logout."""
+import json
+import httpx
+import jwt
+import pytest
+from auth import SERVICE_ROLE, create_access_token, principals
+from main import app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def http(async_db):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def bearer(user_id: int, role: str, **kwargs) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(user_id, role, **kwargs)}"}
+
+
+def batch_item(project, transaction_hash: str) -> dict:
+    return {
+        "amount": 10.0, "nft_token_id": 1, "project_id": project.id,
+        "investor_id": project.investor_id, "transaction_hash": transaction_hash,
+    }
+
+
+async def test_missing_token_is_401(http, project):
+    response = await http.put(f"/api/user/{project.creator_id}", json={"bio": "hi"})
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+
+
+@pytest.mark.parametrize("token", [
+    create_access_token(1, "creator", expires_minutes=-1),
+    jwt.encode({"sub": "1", "role": "creator", "exp": 9999999999}, "not-the-secret", algorithm="HS256"),
+    "not-a-jwt",
+], ids=["expired", "wrong-signature", "malformed"])
+async def test_invalid_token_is_401(http, project, token):
+    response = await http.put(f"/api/user/{project.creator_id}", json={"bio": "hi"}, headers={"Authorization": f"Bearer {token}"})
+    assert (response.status_code, response.json()["detail"]) == (401, "Invalid or expired token")
+
+
+async def test_only_the_owner_can_change_a_user_or_project(http, project):
+    owner = bearer(project.creator_id, "creator")
+    other = bearer(project.creator_id + 1000, "creator")
+
+    assert (await http.put(f"/api/user/{project.creator_id}", json={"bio": "hi"}, headers=other)).status_code == 403
+    assert (await http.put(f"/api/projects/{project.id}", json={"name": "Taken"}, headers=other)).status_code == 403
+    assert (await http.delete(f"/api/projects/{project.id}", headers=other)).status_code == 403
+    assert (await http.put(f"/api/projects/{project.id}", json={"name": "Renamed"}, headers=owner)).status_code == 200
+
+
+async def test_investing_for_someone_else_is_403(http, project):
+    response = await http.post(
+        f"/api/investments?investor_id={project.investor_id + 1000}",
+        json={"amount": 10.0, "nft_token_id": 1, "project_id": project.id},
+        headers=bearer(project.investor_id, "investor"),
+    )
+    assert response.status_code == 403
+
+
+async def test_batch_endpoints_need_a_service_token(http, project):
+    ndjson = json.dumps(batch_item(project, "0xdenied")) + "\n"
+    for headers, status in [({}, 401), (bearer(project.investor_id, "investor"), 403), (bearer(project.creator_id, "creator"), 403)]:
+        assert (await http.post("/api/investments/batch", json=[batch_item(project, "0xdenied")], headers=headers)).status_code == status
+        assert (await http.post("/api/investments/batch/ndjson", content=ndjson, headers=headers)).status_code == status
+
+    response = await http.post("/api/investments/batch", json=[batch_item(project, "0xallowed")], headers=bearer(0, SERVICE_ROLE))
+    assert (response.status_code, response.json()["inserted"]) == (200, 1)
+
+
+async def test_nobody_can_register_as_a_service(http):
+    response = await http.post("/api/register", json={"wallet_address": "0x" + "e" * 40, "role": SERVICE_ROLE})
+    assert response.status_code == 422
+
+
+async def test_logout_revokes_a_cached_token(http, project):
+    headers = bearer(project.creator_id, "creator")
+    assert (await http.put(f"/api/user/{project.creator_id}", json={"bio": "hi"}, headers=headers)).status_code == 200
+    assert principals.get(headers["Authorization"].removeprefix("Bearer ")) is not None
+
+    assert (await http.post("/api/logout", headers=headers)).status_code == 204
+
+    response = await http.put(f"/api/user/{project.creator_id}", json={"bio": "again"}, headers=headers)
+    assert (response.status_code, response.json()["detail"]) == (401, "Token has been revoked")
+    assert (await http.post("/api/logout", headers=headers)).status_code == 401
+    # Only that token: a new sign-in works
+    fresh = bearer(project.creator_id, "creator")
+    assert (await http.put(f"/api/user/{project.creator_id}", json={"bio": "again"}, headers=fresh)).status_code == 200
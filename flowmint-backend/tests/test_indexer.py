@@ -0,0 +1,134 @@
+"""The indexer against the in-memory chain of rpc_stub.py."""
+import httpx
+import pytest
+from sqlalchemy import select, update
+import rpc_stub
+from chain import JsonRpc
+from database import AsyncSessionLocal, ChainLog, Investment, Project, RevenuePayout, User
+from indexer import Indexer
+
+pytestmark = pytest.mark.anyio
+
+ALICE = "0x" + "a" * 40
+BOB = "0x" + "b" * 40
+MINT_PRICE = 50_000_000  # 50 USDC
+MAX_SUPPLY = 10
+
+
+@pytest.fixture
+def chain():
+    rpc_stub.chain.__init__()
+    return rpc_stub.chain
+
+
+@pytest.fixture
+async def indexer(chain, async_db):
+    rpc = JsonRpc("http://rpc-stub/", transport=httpx.ASGITransport(app=rpc_stub.app))
+    yield Indexer(rpc, start_block=0)
+    await rpc.aclose()
+
+
+@pytest.fixture
+async def contracts(chain, project, async_db):
+    deployed = chain.deploy("0x" + "c" * 40, MINT_PRICE, MAX_SUPPLY)
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Project).where(Project.id == project.id)
+            .values(nft_contract_address=deployed["nft"], distributor_address=deployed["distributor"])
+        )
+        await db.commit()
+    return deployed
+
+
+async def all_rows(statement):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(statement)).all()
+
+
+async def totals_by_wallet():
+    return dict(await all_rows(select(User.wallet_address, User.total_invested).where(User.wallet_address.in_([ALICE, BOB]))))
+
+
+async def test_mint_records_an_investment_at_the_mint_price(chain, contracts, indexer, project):
+    token_id = chain.mint(contracts["distributor"], ALICE)
+    await indexer.run(once=True)
+
+    ((amount, nft_token_id, wallet, role),) = await all_rows(
+        select(Investment.amount, Investment.nft_token_id, User.wallet_address, User.role)
+        .join(User, User.id == Investment.investor_id)
+        .where(Investment.project_id == project.id)
+    )
+    assert (amount, nft_token_id, wallet, role) == (50.0, token_id, ALICE, "investor")
+    assert await totals_by_wallet() == {ALICE: 50.0}
+    ((current_revenue,),) = await all_rows(select(Project.current_revenue).where(Project.id == project.id))
+    assert current_revenue == 50.0
+
+
+async def test_transfer_in_the_same_range_as_its_mint(chain, contracts, indexer, project):
+    # An API-recorded investment with the same token id must not be mistaken for the minted one
+    async with AsyncSessionLocal() as db:
+        db.add(Investment(amount=5.0, nft_token_id=1, project_id=project.id, investor_id=project.investor_id))
+        await db.commit()
+    chain.mint(contracts["distributor"], ALICE)
+    token_id = chain.mint(contracts["distributor"], ALICE)
+    chain.transfer(contracts["nft"], ALICE, BOB, token_id)
+    await indexer.run(once=True)
+
+    owners = dict(await all_rows(
+        select(Investment.nft_token_id, User.wallet_address)
+        .join(User, User.id == Investment.investor_id)
+        .where(Investment.transaction_hash.is_not(None))
+    ))
+    assert owners == {0: ALICE, 1: BOB}
+    assert await totals_by_wallet() == {ALICE: 50.0, BOB: 50.0}
+    ((from_user, to_user),) = await all_rows(select(ChainLog.from_user_id, ChainLog.to_user_id).where(ChainLog.event == "transfer"))
+    assert from_user != to_user
+
+
+async def test_deposit_pays_each_token_holder_at_the_deposit(chain, contracts, indexer, project):
+    async with AsyncSessionLocal() as db:
+        db.add(Investment(amount=500.0, nft_token_id=7, project_id=project.id, investor_id=project.investor_id, transaction_hash="0xapi"))
+        await db.commit()
+    chain.mint(contracts["distributor"], ALICE)
+    token_id = chain.mint(contracts["distributor"], ALICE)
+    chain.transfer(contracts["nft"], ALICE, BOB, token_id)
+    chain.deposit(contracts["distributor"], 100_000_000)
+    # Later transfers don't change who was paid
+    chain.transfer(contracts["nft"], BOB, ALICE, token_id)
+    await indexer.run(once=True)
+
+    payouts = dict(await all_rows(
+        select(User.wallet_address, RevenuePayout.amount).join(User, User.id == RevenuePayout.investor_id)
+    ))
+    # 100 USDC over a max supply of 10 is 10 per token; the API-only investment holds none
+    assert payouts == {ALICE: 10.0, BOB: 10.0}
+
+
+async def test_reorg_undoes_orphaned_logs(chain, contracts, indexer, project):
+    chain.mint(contracts["distributor"], ALICE)
+    await indexer.run(once=True)
+    chain.mint(contracts["distributor"], ALICE)
+    chain.deposit(contracts["distributor"], 100_000_000)
+    await indexer.run(once=True)
+    assert await totals_by_wallet() == {ALICE: 100.0}
+
+    chain.reorg(2)
+    await indexer.run(once=True)
+
+    assert await totals_by_wallet() == {ALICE: 50.0}
+    assert [event for event, in await all_rows(select(ChainLog.event))] == ["mint"]
+    assert await all_rows(select(RevenuePayout.id)) == []
+    ((current_revenue,),) = await all_rows(select(Project.current_revenue).where(Project.id == project.id))
+    assert current_revenue == 50.0
+
+
+async def test_reorg_past_the_only_checkpoint_rewinds_to_the_start_block(chain, contracts, indexer):
+    chain.mint(contracts["distributor"], ALICE)
+    chain.mint(contracts["distributor"], ALICE)
+    await indexer.run(once=True)
+
+    chain.reorg(1)
+    await indexer.run(once=True)
+
+    assert await totals_by_wallet() == {ALICE: 50.0}
+    assert len(await all_rows(select(ChainLog.id))) == 1
@@ -0,0 +1,85 @@
+"""RateLimitMiddleware in front of a stub app, with per-worker buckets."""
+import httpx
+import pytest
+import ratelimit
+from auth import create_access_token
+from ratelimit import Limit, MemoryBuckets, RateLimitMiddleware
+
+pytestmark = pytest.mark.anyio
+
+LIMITS = {
+    ("POST", "/api/login"): Limit.parse("2/minute"),
+    ("POST", "/api/register"): Limit.parse("2/minute"),
+}
+
+
+async def ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+@pytest.fixture(autouse=True)
+def buckets(monkeypatch):
+    monkeypatch.setattr(ratelimit, "buckets", MemoryBuckets())
+    ratelimit.rejected.clear()
+
+
+def client(ip: str = "10.0.0.1") -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=RateLimitMiddleware(ok, limits=LIMITS), client=(ip, 5000))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.mark.parametrize("spec", ["0/minute", "-5/minute", "nan/minute", "ten/minute", "5/fortnight", "5"])
+def test_parse_rejects_limits_that_cannot_throttle(spec):
+    with pytest.raises(ValueError, match="count above 0"):
+        Limit.parse(spec)
+
+
+def test_parse_spreads_the_count_over_the_period():
+    assert Limit.parse("120/minute") == Limit(120.0, 2.0)
+
+
+async def test_over_the_limit_gets_429_with_retry_after():
+    async with client() as http:
+        assert [(await http.post("/api/login")).status_code for _ in range(2)] == [200, 200]
+        response = await http.post("/api/login")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests"}
+    # One token refills in 60 / 2 seconds
+    assert response.headers["retry-after"] == "30"
+    assert ratelimit.rejected == {"POST /api/login": 1}
+
+
+async def test_unlimited_routes_and_methods_pass():
+    async with client() as http:
+        for _ in range(5):
+            assert (await http.get("/api/login")).status_code == 200
+            assert (await http.post("/api/projects")).status_code == 200
+
+
+async def test_each_route_has_its_own_bucket():
+    async with client() as http:
+        for _ in range(2):
+            await http.post("/api/login")
+        assert (await http.post("/api/login")).status_code == 429
+        assert (await http.post("/api/register")).status_code == 200
+
+
+async def test_each_ip_has_its_own_bucket():
+    async with client("10.0.0.1") as first, client("10.0.0.2") as second:
+        for _ in range(2):
+            await first.post("/api/login")
+        assert (await first.post("/api/login")).status_code == 429
+        assert (await second.post("/api/login")).status_code == 200
+
+
+async def test_signed_in_clients_are_keyed_by_user_not_ip():
+    alice = {"Authorization": f"Bearer {create_access_token(1, 'investor')}"}
+    bob = {"Authorization": f"Bearer {create_access_token(2, 'investor')}"}
+    async with client("10.0.0.1") as office, client("10.0.0.2") as home:
+        for _ in range(2):
+            await office.post("/api/login", headers=alice)
+        # Alice is throttled from any address, while Bob and anonymous clients behind hers are not
+        assert (await home.post("/api/login", headers=alice)).status_code == 429
+        assert (await office.post("/api/login", headers=bob)).status_code == 200
+        assert (await office.post("/api/login")).status_code == 200
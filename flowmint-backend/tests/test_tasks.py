@@ -0,0 +1,185 @@
+"""The outbox task queue, the counters it maintains and their reconciliation."""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.dml import Update
+import tasks
+from database import AsyncSessionLocal, Investment, OutboxTask, Project, User, engine
+from ledger import apply_investment_deltas, reconcile_counters
+from seeding import seed_demo
+from tasks import TaskQueue, apply_investment, enqueue
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def queue(async_db):
+    return TaskQueue(AsyncSessionLocal)
+
+
+async def add_task(kind: str, payload: dict = None, **values) -> int:
+    async with AsyncSessionLocal() as db:
+        task = enqueue(db, kind, payload or {})
+        for name, value in values.items():
+            setattr(task, name, value)
+        await db.commit()
+        return task.id
+
+
+async def get_task(task_id: int) -> OutboxTask:
+    async with AsyncSessionLocal() as db:
+        return await db.get(OutboxTask, task_id)
+
+
+async def totals(project) -> tuple:
+    async with AsyncSessionLocal() as db:
+        current_revenue = await db.scalar(select(Project.current_revenue).where(Project.id == project.id))
+        total_invested = await db.scalar(select(User.total_invested).where(User.id == project.investor_id))
+        total_revenue = await db.scalar(select(User.total_revenue).where(User.id == project.creator_id))
+    return current_revenue, total_invested, total_revenue
+
+
+async def add_investment(project, amount: float, counters_applied: bool) -> dict:
+    """An investment as POST /api/investments stores it, and its task payload"""
+    async with AsyncSessionLocal() as db:
+        investment = Investment(
+            amount=amount, nft_token_id=1, project_id=project.id, investor_id=project.investor_id,
+            counters_applied=counters_applied,
+        )
+        db.add(investment)
+        await db.commit()
+        return {
+            "investment_id": investment.id, "project_id": project.id, "investor_id": project.investor_id,
+            "creator_id": project.creator_id, "amount": amount, "created_at": investment.created_at.isoformat(),
+        }
+
+
+async def test_investment_task_applies_counters_once(queue, project):
+    payload = await add_investment(project, 25.0, counters_applied=False)
+    task_id = await add_task("investment.created", payload)
+
+    assert await queue.run(task_id)
+    assert await totals(project) == (25.0, 25.0, 25.0)
+    assert (await get_task(task_id)).status == "done"
+
+    # A redelivered task, or the handler running twice, must not count it again
+    assert await queue.run(await add_task("investment.created", payload))
+    async with AsyncSessionLocal() as db:
+        assert await apply_investment(db, payload) is None
+        await db.commit()
+    assert await totals(project) == (25.0, 25.0, 25.0)
+
+
+async def test_failing_task_backs_off_then_gives_up(queue, monkeypatch):
+    async def fail(db, payload):
+        raise RuntimeError("downstream unavailable")
+    monkeypatch.setitem(tasks.HANDLERS, "test.fail", fail)
+    monkeypatch.setattr(tasks, "TASK_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(tasks, "TASK_MAX_ATTEMPTS", 3)
+    task_id = await add_task("test.fail")
+
+    delays = []
+    for _ in range(2):
+        started = datetime.utcnow()
+        assert not await queue.run(task_id)
+        task = await get_task(task_id)
+        assert task.status == "pending" and "downstream unavailable" in task.last_error
+        delays.append((task.run_after - started).total_seconds())
+        # Not due until the backoff has passed
+        assert not await queue.run(task_id)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(OutboxTask).where(OutboxTask.id == task_id).values(run_after=datetime.utcnow()))
+            await db.commit()
+    assert 10 <= delays[0] < 11 and 20 <= delays[1] < 21
+
+    assert not await queue.run(task_id)
+    task = await get_task(task_id)
+    assert (task.status, task.attempts) == ("failed", 3)
+    assert queue.results == {"retried": 2, "failed": 1}
+
+
+async def test_expired_lease_is_reclaimed(queue, monkeypatch):
+    ran = []
+
+    async def record(db, payload):
+        ran.append(payload)
+    monkeypatch.setitem(tasks.HANDLERS, "test.record", record)
+    now = datetime.utcnow()
+    # Claimed by a worker that died, and by one that is still working on it
+    abandoned = await add_task("test.record", {"n": 1}, status="running", attempts=1, locked_until=now - timedelta(seconds=1))
+    held = await add_task("test.record", {"n": 2}, status="running", attempts=1, locked_until=now + timedelta(minutes=1))
+
+    assert await queue.run(abandoned)
+    assert not await queue.run(held)
+    assert ran == [{"n": 1}]
+    task = await get_task(abandoned)
+    assert (task.status, task.attempts, task.locked_until) == ("done", 2, None)
+
+
+async def test_worker_that_lost_its_lease_does_not_commit(queue, project, monkeypatch):
+    async def slow(db, payload):
+        # The lease runs out while this worker is busy, and another worker reclaims the task
+        with engine.begin() as conn:
+            conn.execute(update(OutboxTask).values(locked_until=datetime.utcnow() + timedelta(minutes=5)))
+        await apply_investment_deltas(db, [(project.id, project.investor_id, project.creator_id, 5.0)])
+    monkeypatch.setitem(tasks.HANDLERS, "test.slow", slow)
+    task_id = await add_task("test.slow")
+
+    assert not await queue.run(task_id)
+    assert await totals(project) == (0.0, 0.0, 0.0)
+    assert (await get_task(task_id)).status == "running"
+
+
+async def test_reconcile_fixes_a_broken_total(project, async_db):
+    await add_investment(project, 40.0, counters_applied=True)
+    await add_investment(project, 60.0, counters_applied=False)  # its task will add it
+    async with AsyncSessionLocal() as db:
+        await apply_investment_deltas(db, [(project.id, project.investor_id, project.creator_id, 40.0)])
+        await db.execute(update(User).where(User.id == project.investor_id).values(total_invested=999.0))
+        await db.commit()
+
+    async with AsyncSessionLocal() as db:
+        assert await reconcile_counters(db) == ([], [project.investor_id])
+        await db.commit()
+    assert await totals(project) == (40.0, 40.0, 40.0)
+
+
+async def test_reconcile_leaves_a_total_changed_after_it_was_read(project, async_db, monkeypatch):
+    await add_investment(project, 40.0, counters_applied=True)
+    execute = AsyncSession.execute
+
+    async def concurrent_task(self, statement, *args, **kwargs):
+        # An investment task bumps the total between reconcile's read and its update
+        if isinstance(statement, Update) and statement.table.name == "projects":
+            with engine.begin() as conn:
+                conn.execute(update(Project).where(Project.id == project.id).values(current_revenue=Project.current_revenue + 10.0))
+        return await execute(self, statement, *args, **kwargs)
+    monkeypatch.setattr(AsyncSession, "execute", concurrent_task)
+
+    async with AsyncSessionLocal() as db:
+        project_ids, _ = await reconcile_counters(db)
+        await db.commit()
+    assert project_ids == []
+    assert (await totals(project))[0] == 10.0
+
+
+async def test_concurrent_deltas_are_not_lost(project, async_db):
+    async def invest():
+        async with AsyncSessionLocal() as db:
+            await apply_investment_deltas(db, [(project.id, project.investor_id, project.creator_id, 1.5)])
+            await db.commit()
+
+    await asyncio.gather(*(invest() for _ in range(20)))
+    assert await totals(project) == (30.0, 30.0, 30.0)
+
+
+async def test_reconcile_agrees_with_the_demo_seed(async_db):
+    seed_demo(engine)
+    seed_demo(engine)  # a re-run adds nothing
+
+    async with AsyncSessionLocal() as db:
+        assert await reconcile_counters(db) == ([], [])
+        revenue = dict((await db.execute(select(Project.name, Project.current_revenue))).all())
+    assert revenue == {"Cyber Wolf NFT Collection": 1500.0, "Neon Tiger Music Project": 300.0, "Tech Innovation Hub": 2000.0}
@@ -20,7 +20,7 @@ const InvestorDashboard = ({ data, onRefresh }) => {
     );
   }
 
-  const { user, investments, total_invested, total_projects, recent_revenue } = data;
+  const { user, investments, total_invested, total_projects, total_investments, recent_revenue } = data;
 
   return (
     <div className="space-y-8">
@@ -58,7 +58,7 @@ const InvestorDashboard = ({ data, onRefresh }) => {
         />
         <StatsCard
           title="Active Investments"
-          value={investments.length}
+          value={total_investments}
           icon="📈"
           color="from-green-500 to-emerald-500"
           change="+3"
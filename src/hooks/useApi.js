@@ -113,6 +113,7 @@ export const useApi = () => {
           return userInvestments.reduce((sum, inv) => sum + inv.amount, 0);
         })(),
         total_projects: isCreator ? 1 : 0,
+        total_investments: isCreator ? 0 : JSON.parse(localStorage.getItem('userInvestments') || '[]').length,
         recent_investments: isCreator ? [
           {
             id: 1,